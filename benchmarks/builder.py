@@ -0,0 +1,53 @@
+# building the same function body from tokens (parsed) and with the expression builder, best of 3
+#   PYTHONPATH=src python3 benchmarks/builder.py [N]
+import sys
+import time
+
+from cgen import I32, USIZE, Function, Int
+from cgen.vec import Vec
+from cgen.writer import generate
+
+
+def tokens(vec, n):
+    f = Function("main")
+    v = f.declare(vec.struct, "v")
+    m = f.declare(I32, "m")
+    for i in range(n):
+        f.add(vec.push, [("&", v), (m, "+", Int(i % 100))])
+        f.add(v, ".len", "=", ((v, ".len"), "-", Int(1, USIZE)))
+    return f
+
+
+def fluent(vec, n):
+    f = Function("main")
+    v = f.declare(vec.struct, "v")
+    m = f.declare(I32, "m")
+    for i in range(n):
+        f.run(vec.push(v.addr(), m + i % 100))
+        f.assign(v.attr("len"), v.attr("len") - 1)
+    return f
+
+
+def best(build, vec, n, repeat=3):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f = build(vec, n)
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), generate(f.body)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10**5
+    vec = Vec(I32)
+    results = {}
+    for build in (tokens, fluent):
+        results[build.__name__] = best(build, vec, n)
+    assert results["tokens"][1] == results["fluent"][1]
+    for name, (seconds, _) in results.items():
+        print(f"{name:8} {n} statement pairs {seconds * 1000:10.1f} ms")
+    print(f"speedup {results['tokens'][0] / results['fluent'][0]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# time of `load` on a cold cache (compile) and on a warm one (hash and dlopen only)
+#   PYTHONPATH=src python3 benchmarks/cache.py [FUNCTIONS]
+import sys
+import tempfile
+import time
+
+from cgen import I32, Function, Include, Int, SourceCode
+from cgen.cache import load
+
+
+def build(functions):
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    for i in range(functions):
+        f = Function(f"kernel{i}")
+        f.return_type = I32
+        x = f.add_parameter(I32, "x")
+        for j in range(20):
+            f.add(x, "=", ((x, "*", Int(j + 3)), "+", Int(i)))
+        f.ret(x)
+        source.add(f)
+    return source
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory(prefix="cgen-cache-") as directory:
+        for label in ("cold", "warm"):
+            source = build(functions)
+            start = time.perf_counter()
+            library = load(source, directory=directory)
+            print(f"{label} {time.perf_counter() - start:8.3f} s")
+        print(f"{len(library.functions)} functions loaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# regeneration time of a many-function source after editing a single function
+#   PYTHONPATH=src python3 benchmarks/incremental.py [FUNCTIONS] [STATEMENTS]
+import sys
+import time
+
+from cgen import I32, Function, Int, SourceCode
+from cgen.writer import generate
+
+
+def build(functions, statements):
+    source = SourceCode()
+    for i in range(functions):
+        f = Function(f"f{i}")
+        f.return_type = I32
+        n = f.add_parameter(I32, "n")
+        x = f.declare(I32, "x")
+        f.add(x, "=", n)
+        for j in range(statements):
+            with f.when(x, "<", Int(j)):
+                f.add(x, "=", (x, "+", Int(j)))
+        f.ret(x)
+        source.add(f)
+    return source
+
+
+def timed(source):
+    start = time.perf_counter()
+    generate(source)
+    return time.perf_counter() - start
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    statements = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    source = build(functions, statements)
+    cold = timed(source)
+    f = source.functions[functions // 2]
+    with f.when(f.parameters[0], "==", Int(0)):
+        f.ret(Int(1))
+    edited = timed(source)
+    for f in source.functions:
+        f.invalidate()
+    full = timed(source)
+    print(f"{functions} functions x {statements} statements")
+    print(f"  cold generate:          {cold * 1000:8.1f} ms")
+    print(f"  after one-function edit: {edited * 1000:8.1f} ms")
+    print(f"  full regenerate:        {full * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# memory used by a function body of N statements, `__slots__` nodes against `__dict__` nodes
+#   PYTHONPATH=src python3 benchmarks/memory.py [N]
+import sys
+import time
+import tracemalloc
+
+from cgen import I32, Assign, Block, Function, Int, Op, Variable
+
+
+# stand-ins for the node classes before they were slotted, with the same attributes
+class DictVariable:
+    def __init__(self, ty, name):
+        self.ty = ty
+        self.name = name
+
+
+class DictInt:
+    def __init__(self, value, ty):
+        self.value = value
+        self.ty = ty
+
+
+class DictOp:
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class DictAssign:
+    def __init__(self, place, source):
+        self.place = place
+        self.source = source
+
+
+def build_dict(n):
+    x = DictVariable(I32, "x")
+    # shared like the interned `Int`s of the slotted nodes, so only the node layout differs
+    constants = [DictInt(i, I32) for i in range(100)]
+    return [DictAssign(x, DictOp("+", x, constants[i % 100])) for i in range(n)]
+
+
+def build_slots(n):
+    x = Variable(I32, "x")
+    block = Block()
+    block.statements = [Assign(x, Op("+", x, Int(i % 100))) for i in range(n)]
+    return block
+
+
+def build_function(n):
+    f = Function("f")
+    x = f.declare(I32, "x")
+    for i in range(n):
+        f.add(x, "=", (x, "+", Int(i % 100)))
+    return f
+
+
+def measure(build, n):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(n)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    baseline = None
+    for name, build in [("dict", build_dict), ("slots", build_slots), ("function", build_function)]:
+        size, elapsed = measure(build, n)
+        baseline = baseline or size
+        print(
+            f"{name:>8}: {size / 2**20:8.1f} MiB  {size / n:6.1f} B/statement  {size / baseline:5.2f}x  {elapsed:6.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
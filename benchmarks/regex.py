@@ -0,0 +1,66 @@
+# match throughput of generated DFA matchers against Python's `re`
+#   PYTHONPATH=src python3 benchmarks/regex.py [MEGABYTES]
+import ctypes
+import random
+import re
+import sys
+import time
+
+from cgen import Include, SourceCode
+from cgen.harness import compiled
+from cgen.regex import matcher
+
+
+def text(size, alphabet):
+    rng = random.Random(0)
+    return bytes(rng.choices(alphabet, k=size))
+
+
+# (name, pattern, search, input), inputs are built so that the whole input is scanned
+def workloads(size):
+    lower = b"abcdefghijklmnopqrstuvwxyz "
+    return [
+        ("email search", r"[a-z]+@[a-z]+\.(com|org)", True, text(size, lower)),
+        ("keywords search", r"hello|world|regex|state", True, text(size, lower)),
+        ("pairs match", r"(ab|cd)*x", False, b"abcd" * (size // 4) + b"x"),
+        ("digits match", r"[0-9]+\.[0-9]+e", False, b"1" * (size // 2) + b"." + b"2" * (size // 2) + b"e"),
+    ]
+
+
+def best(run, repeat=3):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+def main():
+    size = int(float(sys.argv[1]) * 2**20) if len(sys.argv) > 1 else 16 * 2**20
+    cases = workloads(size)
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    source.add(Include("stddef.h"))
+    for i, (_, pattern, search, _) in enumerate(cases):
+        source.add(matcher(pattern, f"matcher{i}", search=search))
+    with compiled(source, flags=["-O2", "-shared", "-fPIC"]) as build:
+        library = ctypes.CDLL(build.path)
+        for i, (name, pattern, search, data) in enumerate(cases):
+            function = library[f"matcher{i}"]
+            function.restype = ctypes.c_int
+            function.argtypes = [ctypes.c_char_p, ctypes.c_size_t]
+            c_seconds, c_result = best(lambda function=function, data=data: function(data, len(data)))
+            compiled_pattern = re.compile(pattern.encode())
+            python = compiled_pattern.search if search else compiled_pattern.match
+            re_seconds, re_result = best(lambda python=python, data=data: python(data))
+            assert bool(c_result) == (re_result is not None)
+            megabytes = len(data) / 2**20
+            print(
+                f"{name:16} {pattern:28} cgen {megabytes / c_seconds:9.1f} MB/s   re {megabytes / re_seconds:9.1f} MB/s"
+                f"   {re_seconds / c_seconds:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
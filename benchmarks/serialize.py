@@ -0,0 +1,63 @@
+# rebuilding a large source with its generator against loading it from the binary format
+#   PYTHONPATH=src python3 benchmarks/serialize.py [SCALE]
+import sys
+import time
+
+from cgen import I32, Function, Int, SourceCode
+from cgen.gallery import vec_main
+from cgen.regex import matcher
+from cgen.serialize import dumps, loads
+from cgen.writer import generate
+
+
+def many_functions(n):
+    source = SourceCode()
+    for i in range(n // 10):
+        f = Function(f"f{i}")
+        f.return_type = I32
+        x = f.add_parameter(I32, "x")
+        for j in range(10):
+            with f.when(x, "<", Int(j)):
+                f.add(x, "=", ((x, "*", Int(j + 3)), "+", Int(i % 200)))
+        f.ret(x)
+        source.add(f)
+    return source
+
+
+# best of `repeat` runs, noise only makes them slower
+def timed(run, repeat=3):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+def regex():
+    source = SourceCode()
+    source.add(matcher(r"(\w+\.)*\w+@(\w+\.)+(com|org|net)", search=True))
+    source.add(matcher(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", "uuid"))
+    return source
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 10**4
+    builders = {
+        "vec_main": lambda: vec_main(unroll=scale),
+        "many_functions": lambda: many_functions(scale),
+        "regex": regex,
+    }
+    for name, build in builders.items():
+        build_s, source = timed(build)
+        dump_s, data = timed(lambda: dumps(source))  # noqa: B023
+        load_s, loaded = timed(lambda: loads(data))  # noqa: B023
+        assert generate(loaded) == generate(source)
+        print(
+            f"{name:16} build {build_s * 1000:8.1f} ms  dump {dump_s * 1000:8.1f} ms"
+            f"  load {load_s * 1000:8.1f} ms  {len(data)} bytes  {build_s / load_s:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# a saxpy-like integer kernel, `out[i] = out[i] * a[i] + x` over N elements ROUNDS times, written
+# with scalars and with `Simd(int32_t, LANES)`, built with and without the auto vectorizer
+#   PYTHONPATH=src python3 benchmarks/simd.py [N] [ROUNDS] [LANES]
+import ctypes
+import sys
+import tempfile
+import time
+
+from cgen import I32, USIZE, Function, Include, SourceCode
+from cgen.cache import load
+from cgen.simd import Simd
+
+FLAGS = [
+    ("-O2", "-fno-tree-vectorize"),
+    ("-O2", "-march=native", "-fno-tree-vectorize"),
+    ("-O3", "-march=native"),
+]
+
+
+def kernel(name, step):
+    f = Function(name)
+    out = f.add_parameter(("*", "restrict", I32), "out")
+    a = f.add_parameter(("*", "restrict", I32), "a")
+    x = f.add_parameter(I32, "x")
+    n = f.add_parameter(USIZE, "n")
+    rounds = f.add_parameter(USIZE, "rounds")
+    i = f.declare(USIZE, "i")
+    with f.loop(rounds > 0):
+        f.assign(i, 0)
+        with f.loop(i < n):
+            step(f, out, a, x, i)
+        f.assign(rounds, rounds - 1)
+    return f
+
+
+def build(lanes):
+    simd = Simd(I32, lanes)
+
+    def scalar(f, out, a, x, i):
+        f.assign(out[i], out[i] * a[i] + x)
+        f.assign(i, i + 1)
+
+    def vector(f, out, a, x, i):
+        total = simd.load(out[i].addr()) * simd.load(a[i].addr()) + x
+        f.run(simd.store(out[i].addr(), total))
+        f.assign(i, i + lanes)
+
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    source.add(Include("stddef.h"))
+    source.add(simd)
+    source.add(kernel("scalar", scalar))
+    source.add(kernel("vector", vector))
+    return source
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    lanes = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    assert n % lanes == 0
+    with tempfile.TemporaryDirectory(prefix="cgen-simd-") as directory:
+        for flags in FLAGS:
+            library = load(build(lanes), flags=flags, directory=directory)
+            seconds = {}
+            for name in ("scalar", "vector"):
+                out, a = (ctypes.c_int32 * n)(*range(n)), (ctypes.c_int32 * n)(*([3] * n))
+                start = time.perf_counter()
+                getattr(library, name)(out, a, 1, n, rounds)
+                seconds[name] = time.perf_counter() - start
+            speedup = seconds["scalar"] / seconds["vector"]
+            print(
+                f"{' '.join(flags):38} scalar {seconds['scalar']:7.3f} s  vector {seconds['vector']:7.3f} s  {speedup:.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# C compile time of one large source as a single file and split for `make -jN`
+#   PYTHONPATH=src python3 benchmarks/split.py [FUNCTIONS] [JOBS]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from cgen import I32, Function, Include, Int, SourceCode
+from cgen.harness import compile_in
+from cgen.split import write_split
+
+
+def build(functions):
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    for i in range(functions):
+        f = Function(f"f{i}")
+        f.return_type = I32
+        x = f.add_parameter(I32, "x")
+        for j in range(20):
+            with f.when(x, "<", Int(j)):
+                f.add(x, "=", ((x, "*", Int(j + 3)), "+", Int(i)))
+        f.ret(x)
+        source.add(f)
+    main = Function("main")
+    main.return_type = I32
+    main.ret(Int(0))
+    source.add(main)
+    return source
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    source = build(functions)
+    with tempfile.TemporaryDirectory(prefix="cgen-") as directory:
+        single = compile_in(source, directory).compile_seconds
+    with tempfile.TemporaryDirectory(prefix="cgen-") as directory:
+        write_split(source, directory, units=jobs)
+        start = time.perf_counter()
+        subprocess.run(["make", f"-j{jobs}"], cwd=directory, check=True, capture_output=True)
+        split = time.perf_counter() - start
+    print(f"single file        {single:8.2f} s")
+    print(f"{jobs:2} units, make -j {split:8.2f} s  {single / split:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
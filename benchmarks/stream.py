@@ -0,0 +1,44 @@
+# peak memory of writing one huge function to a file, with stored and with streamed statements
+#   PYTHONPATH=src python3 benchmarks/stream.py [STATEMENTS]
+import os
+import sys
+import time
+import tracemalloc
+
+from cgen import I32, USIZE, Function, Int, Op, SetItem, SourceCode
+from cgen.writer import generate_to
+
+
+def build(n, *, lazy):
+    f = Function("fill")
+    a = f.add_parameter(("*", I32), "a")
+
+    def statements():
+        for i in range(n):
+            yield SetItem(a, Int(i, USIZE), Op("*", Int(i % 100), Int(3)))
+
+    if lazy:
+        f.stream(statements)
+    else:
+        for statement in statements():
+            f.append(statement)
+    source = SourceCode()
+    source.add(f)
+    return source
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10**5
+    for lazy in (False, True):
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(os.devnull, "w") as fp:
+            generate_to(build(n, lazy=lazy), fp)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{'streamed' if lazy else 'stored':8} {n} statements {seconds:8.2f} s  peak {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
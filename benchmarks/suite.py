@@ -0,0 +1,210 @@
+# generator side throughput: AST build, parse, type check and generate on scaled workloads
+#   PYTHONPATH=src python3 benchmarks/suite.py run [-o result.json] [--full] [--repeat N] [-k FILTER]
+#   PYTHONPATH=src python3 benchmarks/suite.py compare base.json new.json [--threshold 0.1]
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from cgen import I32, USIZE, Call, Function, Int, Op, SourceCode, Struct, Variable
+from cgen.__about__ import __version__
+from cgen.checking import OFF, checks, verify
+from cgen.gallery import vec_main
+from cgen.parse import parse
+from cgen.vec import Vec
+from cgen.writer import generate
+
+SMALL = [10**3, 10**4, 10**5]
+FULL = [*SMALL, 10**6]
+
+
+def timed(run):
+    start = time.perf_counter()
+    result = run()
+    return time.perf_counter() - start, result
+
+
+def reset(source):
+    for item in source.structs:
+        item.definition_text = None
+    for item in source.functions:
+        item.invalidate()
+
+
+def measure_source(build):
+    build_s, source = timed(build)
+    generate_s, text = timed(lambda: generate(source))
+    reset(source)
+    tracemalloc.start()
+    generate(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"build_s": build_s, "generate_s": generate_s, "generate_peak_bytes": peak, "output_bytes": len(text)}
+
+
+def unrolled_vec_push(n):
+    return measure_source(lambda: vec_main(unroll=n))
+
+
+def vec_push_tokens(n):
+    vec = Vec(I32)
+    v = Variable(vec.struct, "v")
+    return [(vec.push, [("&", v), Int(i % 100)]) for i in range(n)]
+
+
+def parse_cost(n):
+    tokens = vec_push_tokens(n)
+    parse_s, _ = timed(lambda: [parse(token) for token in tokens])
+    return {"parse_s": parse_s}
+
+
+# node construction from already parsed operands with the type checks in constructors, without
+# any, and with a single verification afterwards
+def check_cost(n):
+    vec = Vec(I32)
+    v = Variable(vec.struct, "v")
+    m = Variable(I32, "m")
+    address = Op.unary("&", v)
+
+    def build():
+        f = Function("main")
+        for i in range(n):
+            f.run(Call(vec.push, [address, Op("+", m, Int(i % 100))]))
+        return f
+
+    check_s, _ = timed(build)
+    with checks(OFF):
+        unchecked_s, f = timed(build)
+    verify_s, _ = timed(lambda: verify([f]))
+    return {"check_s": check_s, "unchecked_s": unchecked_s, "verify_s": verify_s}
+
+
+def wide_struct(n):
+    fields = min(n, 1000)
+
+    def build():
+        s = Struct("Wide")
+        for i in range(fields):
+            s.add_field(USIZE, f"f{i}")
+        f = Function("touch")
+        v = f.add_parameter(("*", s), "v")
+        for i in range(n):
+            f.add(v, f".f{i % fields}", "=", ((v, f".f{(i + 1) % fields}"), "+", Int(1, USIZE)))
+        source = SourceCode()
+        source.add(s)
+        source.add(f)
+        return source
+
+    return measure_source(build)
+
+
+def deep_expression(n):
+    depth = 200
+
+    def build():
+        f = Function("deep")
+        f.return_type = I32
+        a = f.add_parameter(I32, "a")
+        x = f.declare(I32, "x")
+        for _ in range(n // depth):
+            expression = a
+            for i in range(depth):
+                expression = (expression, "+", Int(i % 7))
+            f.add(x, "=", expression)
+        f.ret(x)
+        source = SourceCode()
+        source.add(f)
+        return source
+
+    return measure_source(build)
+
+
+def many_functions(n):
+    statements = 10
+
+    def build():
+        source = SourceCode()
+        for i in range(n // statements):
+            f = Function(f"f{i}")
+            f.return_type = I32
+            x = f.add_parameter(I32, "x")
+            for j in range(statements):
+                with f.when(x, "<", Int(j)):
+                    f.add(x, "=", (x, "+", Int(j)))
+            f.ret(x)
+            source.add(f)
+        return source
+
+    return measure_source(build)
+
+
+WORKLOADS = [unrolled_vec_push, parse_cost, check_cost, wide_struct, deep_expression, many_functions]
+
+
+def run(args):
+    results = {}
+    for workload in WORKLOADS:
+        for n in FULL if args.full else SMALL:
+            name = f"{workload.__name__}/{n}"
+            if args.filter and args.filter not in name:
+                continue
+            # best of repeats for every metric, since noise only makes things slower
+            repeats = [workload(n) for _ in range(args.repeat)]
+            results[name] = {metric: min(result[metric] for result in repeats) for metric in repeats[0]}
+            print(name, " ".join(f"{metric}={value:.4g}" for metric, value in results[name].items()), file=sys.stderr)
+    report = {
+        "meta": {"cgen": __version__, "python": platform.python_version(), "machine": platform.machine()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+def compare(args):
+    with open(args.base) as fp:
+        base = json.load(fp)["results"]
+    with open(args.new) as fp:
+        new = json.load(fp)["results"]
+    regressed = False
+    for name in sorted(base.keys() & new.keys()):
+        for metric in sorted(base[name].keys() & new[name].keys()):
+            if metric == "output_bytes":
+                continue
+            before, after = base[name][metric], new[name][metric]
+            ratio = after / before if before else 1.0
+            flag = ""
+            if ratio > 1 + args.threshold:
+                flag = "  REGRESSION"
+                regressed = True
+            elif ratio < 1 - args.threshold:
+                flag = "  improved"
+            print(f"{name:28} {metric:20} {before:12.4g} -> {after:12.4g}  {ratio:6.2f}x{flag}")
+    return 1 if regressed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("-o", "--output")
+    run_parser.add_argument("--full", action="store_true", help="also run 10^6 scale")
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("-k", "--filter")
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
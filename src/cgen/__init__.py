@@ -1,16 +1,55 @@
 # SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
 #
 # SPDX-License-Identifier: MIT
+import copy
+import os
+import weakref
 from contextlib import contextmanager
 
+from cgen import checking
+from cgen.checking import STRICT, TypeCheckError, describe
+from cgen.parallel import render_definitions
 from cgen.parse import parse, parse_type
-from cgen.writer import generate
+from cgen.profile import write_profiled, write_profiled_return
+from cgen.writer import generate, render
+
+
+class Interned(type):
+    # hash consing: constructing a structurally equal object returns the existing instance, so
+    # instances of these classes can be compared and hashed by identity
+    # instances are held weakly, as keys may refer to structs (hashed by identity) which would
+    # otherwise be kept alive forever by a long running generator; classes with `bounded_keys`,
+    # made of names and small numbers only, keep theirs so they are not built again and again
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls.interned = {} if namespace.get("bounded_keys") else weakref.WeakValueDictionary()
+
+    def __call__(cls, *args, **kwargs):
+        key = cls.intern_key(*args, **kwargs)
+        if key is None:
+            return super().__call__(*args, **kwargs)
+        instance = cls.interned.get(key)
+        if instance is None:
+            instance = super().__call__(*args, **kwargs)
+            cls.interned[key] = instance
+        return instance
+
+
+class Primitive(metaclass=Interned):
+    __slots__ = ("name",)
+    bounded_keys = True
 
-
-class Primitive:
     def __init__(self, name):
         self.name = name
 
+    @staticmethod
+    def intern_key(name):
+        return name
+
+    # unpickle through the constructor so the instance is interned again
+    def __reduce__(self):
+        return Primitive, (self.name,)
+
     def write(self, writer):
         writer.write(self.name)
 
@@ -22,8 +61,6 @@ class Primitive:
     def write_mangled(self, writer):
         self.write(writer)
 
-    # consider override __eq__ by comparing name?
-
 
 UNIT = Primitive("void")
 I32 = Primitive("int32_t")
@@ -38,36 +75,128 @@ INT = Primitive("int")  # for comparison result type
 CHAR = Primitive("char")  # for string literal type
 
 
-class Pointer:
-    def __init__(self, inner):
+STORAGES = (None, "static", "extern")
+FUNCTION_ATTRIBUTES = ("hot", "cold", "always_inline", "noinline", "flatten", "pure", "const", "unused")
+
+# in C order, which is also the order they are written in
+QUALIFIERS = ("const", "volatile", "restrict")
+
+
+# `qualifiers` apply to the pointer itself, as in `int32_t *restrict`, see `Qualified` for the pointee
+class Pointer(metaclass=Interned):
+    __slots__ = ("__weakref__", "inner", "qualifiers")
+
+    def __init__(self, inner, qualifiers=()):
         self.inner = inner
+        self.qualifiers = Pointer.intern_key(inner, qualifiers)[1]
+
+    @staticmethod
+    def intern_key(inner, qualifiers=()):
+        assert all(qualifier in QUALIFIERS for qualifier in qualifiers), f"unknown qualifiers {qualifiers}"
+        return inner, tuple(qualifier for qualifier in QUALIFIERS if qualifier in qualifiers)
+
+    def __reduce__(self):
+        return Pointer, (self.inner, self.qualifiers)
 
     def write(self, writer):
         self.inner.write(writer)
-        if not isinstance(self.inner, Pointer):
+        if not isinstance(self.inner, Pointer) or self.inner.qualifiers:
             writer.space()
         writer.write("*")
+        writer.write(" ".join(self.qualifiers))
 
     def write_declaration(self, identifier, writer):
         self.write(writer)
+        if self.qualifiers:
+            writer.space()
         writer.write(identifier)
 
     def write_mangled(self, writer):
         writer.write("ptr_")
+        for qualifier in self.qualifiers:
+            writer.write(qualifier + "_")
         self.inner.write_mangled(writer)
 
-    def __eq__(self, other):
-        return isinstance(other, Pointer) and self.inner == other.inner
 
-    def __hash__(self):
-        return hash((self.inner, "*"))
+# a non-pointer type with `qualifiers`, mostly as what a pointer points to, as in
+# `const int32_t *restrict`; pointers carry their own qualifiers instead
+# values read from it through `[]`, `.` and `->` have the unqualified type
+class Qualified(metaclass=Interned):
+    __slots__ = ("__weakref__", "inner", "qualifiers")
+
+    def __init__(self, inner, qualifiers):
+        self.inner = inner
+        self.qualifiers = Qualified.intern_key(inner, qualifiers)[1]
+
+    @staticmethod
+    def intern_key(inner, qualifiers):
+        assert not isinstance(inner, (Pointer, Qualified)), f"qualify {describe(inner)} itself"
+        assert qualifiers, "no qualifiers"
+        assert all(qualifier in ("const", "volatile") for qualifier in qualifiers), f"unknown qualifiers {qualifiers}"
+        return inner, tuple(qualifier for qualifier in QUALIFIERS if qualifier in qualifiers)
+
+    def __reduce__(self):
+        return Qualified, (self.inner, self.qualifiers)
+
+    def write(self, writer):
+        writer.write(" ".join(self.qualifiers))
+        writer.space()
+        self.inner.write(writer)
+
+    def write_declaration(self, identifier, writer):
+        writer.write(" ".join(self.qualifiers))
+        writer.space()
+        self.inner.write_declaration(identifier, writer)
+
+    def write_mangled(self, writer):
+        for qualifier in self.qualifiers:
+            writer.write(qualifier + "_")
+        self.inner.write_mangled(writer)
+
 
+def unqualified(ty):
+    return ty.inner if type(ty) is Qualified else ty
+
+
+# whether a value of type `source` can be stored into `target`; the qualifiers of the value itself
+# do not matter, so `int32_t *` passes as `int32_t *restrict` and back, and qualifiers may be added
+# to what a pointer points to but not dropped, so `int32_t *` passes as `const int32_t *` only
+def assignable(target, source):
+    if target is source:
+        return True
+    target, source = unqualified(target), unqualified(source)
+    if target is source:
+        return True
+    if not (isinstance(target, Pointer) and isinstance(source, Pointer)):
+        return False
+    target_inner, source_inner = target.inner, source.inner
+    if unqualified(target_inner) is not unqualified(source_inner):
+        return False
+    return type(source_inner) is not Qualified or (
+        type(target_inner) is Qualified and set(source_inner.qualifiers) <= set(target_inner.qualifiers)
+    )
+
+
+# stores into a place of type `ty`, which must not be const
+def check_store(ty):
+    if ty is not None and "const" in getattr(ty, "qualifiers", ()):
+        raise TypeCheckError(f"store into {describe(ty)}")
+
+
+class Array(metaclass=Interned):
+    __slots__ = ("__weakref__", "inner", "length")
 
-class Array:
     def __init__(self, inner, length):
         self.inner = inner
         self.length = length
 
+    @staticmethod
+    def intern_key(inner, length):
+        return inner, length
+
+    def __reduce__(self):
+        return Array, (self.inner, self.length)
+
     def write(self, writer):
         self.inner.write(writer)
         writer.write(f"[{self.length}]")
@@ -81,17 +210,20 @@ class Array:
         writer.write(f"array{self.length}_")
         self.inner.write_mangled(writer)
 
-    def __eq__(self, other):
-        return isinstance(other, Array) and self.inner == other.inner
-
-    def __hash__(self):
-        return hash((self.inner, "[]"))
 
+class FunctionType(metaclass=Interned):
+    __slots__ = ("__weakref__", "parameter_types", "return_type")
 
-class FunctionType:
     def __init__(self, return_type, parameter_types):
         self.return_type = return_type
-        self.parameter_types = parameter_types
+        self.parameter_types = tuple(parameter_types)
+
+    @staticmethod
+    def intern_key(return_type, parameter_types):
+        return return_type, tuple(parameter_types)
+
+    def __reduce__(self):
+        return FunctionType, (self.return_type, self.parameter_types)
 
     def write(self, writer):
         self.return_type.write(writer)
@@ -115,15 +247,6 @@ class FunctionType:
     def writer_mangled(self, writer):
         raise NotImplementedError  # need to carefully think about this...
 
-    def __eq__(self, other):
-        return isinstance(other, FunctionType) and (self.return_type, self.parameter_types) == (
-            other.return_type,
-            other.parameter_types,
-        )
-
-    def __hash__(self):
-        return hash((self.parameter_types, "->", self.return_type))
-
 
 def mangled_name(writer, name, type_arguments):
     writer.write(name)
@@ -135,14 +258,94 @@ def mangled_name(writer, name, type_arguments):
         argument.write_mangled(writer)
 
 
+# supported lane types, by name, and the lanes of their comparison results, signed integers as
+# wide as the compared lanes
+MASK_LANES = {
+    "int": "int",
+    "int8_t": "int8_t",
+    "uint8_t": "int8_t",
+    "int16_t": "int16_t",
+    "uint16_t": "int16_t",
+    "int32_t": "int32_t",
+    "uint32_t": "int32_t",
+    "float": "int32_t",
+    "int64_t": "int64_t",
+    "uint64_t": "int64_t",
+    "double": "int64_t",
+}
+FLOATS = ("float", "double")
+
+
+# GCC vector extension type, also supported by clang, defined by adding it to a `SourceCode`:
+#   typedef int32_t vector4_int32_t __attribute__((vector_size(4 * sizeof(int32_t))));
+# operators work lanewise, with a scalar operand of the lane type broadcast, and lanes are
+# indexed as arrays; see `cgen.simd` for loads, stores and broadcast
+class VectorType(metaclass=Interned):
+    __slots__ = ("__weakref__", "inner", "lanes")
+
+    def __init__(self, inner, lanes):
+        self.inner = inner
+        self.lanes = lanes
+
+    @staticmethod
+    def intern_key(inner, lanes):
+        assert isinstance(inner, Primitive), f"vector of {inner}"
+        assert inner.name in MASK_LANES, f"vector of {inner.name}"
+        assert lanes > 0, f"{lanes} lanes"
+        assert lanes & (lanes - 1) == 0, f"{lanes} lanes, not a power of 2"
+        return inner, lanes
+
+    def __reduce__(self):
+        return VectorType, (self.inner, self.lanes)
+
+    # type of the comparison results
+    def mask_type(self):
+        return VectorType(Primitive(MASK_LANES[self.inner.name]), self.lanes)
+
+    def write(self, writer):
+        self.write_mangled(writer)
+
+    def write_declaration(self, identifier, writer):
+        self.write(writer)
+        writer.space()
+        writer.write(identifier)
+
+    def write_mangled(self, writer):
+        writer.write(f"vector{self.lanes}_")
+        self.inner.write_mangled(writer)
+
+    def definition(self):
+        return render(self.write_definition)
+
+    def write_definition(self, writer):
+        writer.write("typedef ")
+        self.inner.write_declaration(generate(self), writer)
+        writer.write(f" __attribute__((vector_size({self.lanes} * sizeof(")
+        self.inner.write(writer)
+        writer.write("))));")
+
+
+# nominal type: every `Struct` is a distinct type, compared and hashed by identity
 class Struct:
+    __slots__ = ("definition_text", "field_index", "fields", "name", "type_arguments")
+
     def __init__(self, name, **type_arguments):
         self.name = name
         self.type_arguments = type_arguments
         self.fields = []
+        self.field_index = {}  # identifier -> (position in `fields`, type)
+        self.definition_text = None
 
     def add_field(self, ty, identifier):
+        assert identifier not in self.field_index, f"duplicate field {identifier}"
+        self.field_index[identifier] = (len(self.fields), ty)
         self.fields.append((ty, identifier))
+        self.definition_text = None
+
+    def definition(self):
+        if self.definition_text is None:
+            self.definition_text = render(self.writer_definition)
+        return self.definition_text
 
     def write_declaration(self, identifier, writer):
         self.write(writer)
@@ -169,25 +372,183 @@ class Struct:
         writer.write(";")
 
 
-class Int:
+# operator overloading to build expression nodes directly, skipping the token parsing, e.g.
+#   f.assign(v.attr("len"), v.attr("len") + 1)
+#   f.run(vec.push(v.addr(), m))
+# Python ints become `Int` of the other operand's type; `==` and `!=` keep comparing identity so
+# use `eq` and `ne` for them
+class Expression:
+    __slots__ = ()
+    __iter__ = None  # not a sequence despite `__getitem__`
+
+    def literal(self, other):
+        if not isinstance(other, int):
+            return other
+        # broadcast by the operator for vectors
+        return Int(other, self.ty.inner if type(self.ty) is VectorType else self.ty)
+
+    def binary(self, op, other):
+        return Op(op, self, self.literal(other))
+
+    def reflected(self, op, other):
+        return Op(op, self.literal(other), self)
+
+    def __add__(self, other):
+        return self.binary("+", other)
+
+    def __radd__(self, other):
+        return self.reflected("+", other)
+
+    def __sub__(self, other):
+        return self.binary("-", other)
+
+    def __rsub__(self, other):
+        return self.reflected("-", other)
+
+    def __mul__(self, other):
+        return self.binary("*", other)
+
+    def __rmul__(self, other):
+        return self.reflected("*", other)
+
+    def __truediv__(self, other):
+        return self.binary("/", other)
+
+    def __rtruediv__(self, other):
+        return self.reflected("/", other)
+
+    def __mod__(self, other):
+        return self.binary("%", other)
+
+    def __rmod__(self, other):
+        return self.reflected("%", other)
+
+    def __lshift__(self, other):
+        return self.binary("<<", other)
+
+    def __rlshift__(self, other):
+        return self.reflected("<<", other)
+
+    def __rshift__(self, other):
+        return self.binary(">>", other)
+
+    def __rrshift__(self, other):
+        return self.reflected(">>", other)
+
+    def __and__(self, other):
+        return self.binary("&", other)
+
+    def __rand__(self, other):
+        return self.reflected("&", other)
+
+    def __or__(self, other):
+        return self.binary("|", other)
+
+    def __ror__(self, other):
+        return self.reflected("|", other)
+
+    def __xor__(self, other):
+        return self.binary("^", other)
+
+    def __rxor__(self, other):
+        return self.reflected("^", other)
+
+    def __invert__(self):
+        return Op.unary("~", self)
+
+    def __lt__(self, other):
+        return self.binary("<", other)
+
+    def __le__(self, other):
+        return self.binary("<=", other)
+
+    def __gt__(self, other):
+        return self.binary(">", other)
+
+    def __ge__(self, other):
+        return self.binary(">=", other)
+
+    def eq(self, other):
+        return self.binary("==", other)
+
+    def ne(self, other):
+        return self.binary("!=", other)
+
+    def and_(self, other):
+        return self.binary("&&", other)
+
+    def or_(self, other):
+        return self.binary("||", other)
+
+    def not_(self):
+        return Op.unary("!", self)
+
+    def addr(self):
+        return Op.unary("&", self)
+
+    def sizeof(self):
+        return Op.unary("sizeof", self)
+
+    def cast(self, ty):
+        return Cast(parse_type(ty), self)
+
+    def attr(self, name):
+        return GetAttr(self, name)
+
+    def __getitem__(self, position):
+        return GetItem(self, Int(position, USIZE) if isinstance(position, int) else position)
+
+    def __call__(self, *arguments):
+        return call(self, arguments)
+
+
+def call(callee, arguments):
+    callee_type = callee.ty
+    if callee_type:
+        arguments = [
+            Int(argument, ty) if isinstance(argument, int) else argument
+            for argument, ty in zip(arguments, callee_type.parameter_types)
+        ]
+    return Call(callee, list(arguments))
+
+
+SMALL_INT = 256
+
+
+class Int(Expression, metaclass=Interned):
+    __slots__ = ("ty", "value")
+    bounded_keys = True  # only small values are shared
+
     def __init__(self, value, ty=I32):
-        assert isinstance(value, int)
         self.value = value
-        assert ty in (INT, I32, U8, U32, U64, USIZE)  #
         self.ty = ty
 
+    # small constants are shared, so treat `Int` as immutable
+    # checked here as the key is built before `__init__`, where `True` would already be shared as 1
+    @staticmethod
+    def intern_key(value, ty=I32):
+        assert type(value) is int, f"Int of {value!r}"
+        # integer literals of every vector lane type, so they can be broadcast
+        assert ty is USIZE or getattr(ty, "name", None) in MASK_LANES, f"Int of type {describe(ty)}"
+        if -SMALL_INT <= value < SMALL_INT:
+            return value, ty
+        return None
+
+    def __reduce__(self):
+        return Int, (self.value, self.ty)
+
+    # decimal constants past `long long` are unsigned only with a suffix, compilers warn otherwise
     def write(self, writer):
-        writer.write(str(self.value))
+        writer.write(str(self.value) if self.value < 1 << 63 else f"{self.value}ULL")
+
 
+class String(Expression):
+    __slots__ = ("ty", "value")
 
-class String:
     def __init__(self, value):
         assert isinstance(value, str)
         self.value = value
-
-    @property
-    def ty(self):
-        return Pointer(CHAR)
+        self.ty = Pointer(CHAR)
 
     def write(self, writer):
         writer.write("(char[])")
@@ -197,13 +558,12 @@ class String:
                 next(comma_writer).write(repr(c))
 
 
-class Null:
+class Null(Expression):
+    __slots__ = ("inner_type", "ty")
+
     def __init__(self, inner_type):
         self.inner_type = inner_type
-
-    @property
-    def ty(self):
-        return Pointer(self.inner_type)
+        self.ty = Pointer(inner_type)
 
     def write(self, writer):
         with writer.parentheses():
@@ -213,15 +573,97 @@ class Null:
 
 
 class Function:
+    __slots__ = (
+        "_return_type",
+        "active_block",
+        "attributes",
+        "body",
+        "definition_text",
+        "forward_declaration_text",
+        "function_type",
+        "identifiers",
+        "inline",
+        "labels",
+        "lazy",
+        "name",
+        "parameters",
+        "processed",
+        "storage",
+        "type_arguments",
+        "verified",
+    )
+
     def __init__(self, name, **type_arguments):
         self.name = name
         self.type_arguments = type_arguments
         self.parameters = []
-        self.return_type = UNIT
+        self._return_type = UNIT
+        self.function_type = None  # `ty`, reset when the signature changes
         self.body = Block()
         self.active_block = self.body
         self.identifiers = {}
         self.labels = {}
+        self.lazy = False  # has a `Stream`, see `stream`
+        # see `specify`
+        self.storage = None
+        self.inline = False
+        self.attributes = ()
+        # emitted text, reused by `SourceCode.write` until the function is changed
+        self.forward_declaration_text = None
+        self.definition_text = None
+        self.processed = None  # (passes, the copy they ran on), see `with_passes`
+        self.verified = False  # passed `checking.verify` since the last change, for DEFERRED
+
+    @property
+    def return_type(self):
+        return self._return_type
+
+    @return_type.setter
+    def return_type(self, ty):
+        self._return_type = ty
+        self.function_type = None
+        self.invalidate()
+
+    # every modification through `Function` methods calls this; call it manually after
+    # modifying any `Block` of the function directly
+    def invalidate(self):
+        self.forward_declaration_text = None
+        self.definition_text = None
+        self.processed = None
+        self.verified = False
+
+    # the function as `passes` rewrite it, run on a copy since functions may be shared between
+    # sources with different passes (as the ones of `Vec`); the copy is kept for the last passes
+    def with_passes(self, passes):
+        passes = tuple(passes)
+        if not passes or self.lazy:
+            return self
+        if self.processed is None or self.processed[0] != passes:
+            processed = copy.copy(self)
+            processed.body = copy_block(self.body)
+            processed.active_block = processed.body
+            processed.invalidate()
+            for run_pass in passes:
+                run_pass(processed)
+            self.processed = passes, processed
+        return self.processed[1]
+
+    # how the function is declared, e.g. `specify(storage="static", inline=True)` for
+    #   static inline void vec_push(...)
+    # a plain `inline` without storage follows C99, which emits no external definition
+    def specify(self, *, storage=None, inline=False, attributes=()):
+        assert storage in STORAGES, f"unknown storage {storage}"
+        assert all(attribute in FUNCTION_ATTRIBUTES for attribute in attributes), f"unknown attributes {attributes}"
+        self.storage = storage
+        self.inline = inline
+        self.attributes = tuple(attributes)
+        self.invalidate()
+
+    # whether the definition provides an external symbol; static and plain inline ones are local to
+    # each unit that includes them
+    @property
+    def exported(self):
+        return self.storage == "extern" or (self.storage is None and not self.inline)
 
     def add_parameter(self, ty, identifier=None):
         assert not self.body.statements, "parameter must be added first"
@@ -229,11 +671,19 @@ class Function:
         assert all(variable.name != identifier for variable in self.parameters)
         variable = Variable(ty, identifier)
         self.parameters.append(variable)
+        self.function_type = None
+        self.invalidate()
         return variable
 
+    def append(self, statement):
+        self.active_block.statements.append(statement)
+        self.invalidate()
+
     @property
     def ty(self):
-        return FunctionType(self.return_type, [parameter.ty for parameter in self.parameters])
+        if self.function_type is None:
+            self.function_type = FunctionType(self.return_type, [parameter.ty for parameter in self.parameters])
+        return self.function_type
 
     def declare(self, ty, identifier_hint=None):
         identifier_hint = identifier_hint or "x"
@@ -244,20 +694,21 @@ class Function:
         else:
             self.identifiers[identifier] = 1
         variable = Variable(ty, identifier)
-        self.active_block.statements.append(Declare(variable))
+        self.append(Declare(variable))
         return variable
 
-    def if_else(self, *condition_tokens):
-        statement = IfElse(parse(tuple(condition_tokens)))
-        self.active_block.statements.append(statement)
+    # `expect` is the likely value of the condition, see `IfElse`
+    def if_else(self, *condition_tokens, expect=None):
+        statement = IfElse(parse(tuple(condition_tokens)), expect)
+        self.append(statement)
         return (self.block_context(statement.positive), self.block_context(statement.negative))
 
-    def when(self, *condition_tokens):
-        return self.if_else(*condition_tokens)[0]
+    def when(self, *condition_tokens, expect=None):
+        return self.if_else(*condition_tokens, expect=expect)[0]
 
     def loop(self, *condition_tokens):
         statement = While(parse(tuple(condition_tokens)))
-        self.active_block.statements.append(statement)
+        self.append(statement)
         return self.block_context(statement.body)
 
     def label(self, name_hint=None):
@@ -269,14 +720,85 @@ class Function:
         else:
             self.labels[name] = 1
         label = Label(name)
-        self.active_block.statements.append(label)
+        self.append(label)
         return label
 
+    # the label can be left out and assigned later, for jumping forward to a label not placed yet
+    def goto(self, label=None):
+        statement = Goto(label)
+        self.append(statement)
+        return statement
+
+    # `counter` runs from its current value (at most `bound`) to `bound` with `body(index)` building
+    # one iteration in the active block; the main loop has `factor` copies of the body, and the
+    # remaining iterations run either in a "loop" or in a "switch" with falling through cases
+    def unroll(self, counter, bound, factor, body, *, remainder="loop"):
+        assert factor >= 1
+        bound = Int(bound, counter.ty) if isinstance(bound, int) else parse(bound)
+        step = Int(factor, counter.ty)
+        one = Int(1, counter.ty)
+        with self.loop((bound, "-", counter), ">=", step):
+            for offset in range(factor):
+                body(Op("+", counter, Int(offset, counter.ty)) if offset else counter)
+            self.add(counter, "=", (counter, "+", step))
+        if factor == 1:
+            return
+        if remainder == "loop":
+            with self.loop(counter, "<", bound):
+                body(counter)
+                self.add(counter, "=", (counter, "+", one))
+        elif remainder == "switch":
+            statement = Switch(Op("-", bound, counter))
+            self.append(statement)
+            for count in range(factor - 1, 0, -1):
+                with self.block_context(statement.add_case(Int(count, counter.ty))):
+                    body(counter)
+                    self.add(counter, "=", (counter, "+", one))
+        else:
+            raise ValueError(remainder)
+
     def add(self, *statement_tokens):
         statement = parse(tuple(statement_tokens))
         if not isinstance(statement, (Assign, SetAttr, SetItem)):
             statement = Run(statement)
-        self.active_block.statements.append(statement)
+        self.append(statement)
+
+    # statements produced by `factory()` each time the function is written, instead of being
+    # stored; a lazy function is not cached, rendered in parallel or run through passes, so with
+    # `generate_to` its body is never held in memory as a whole (see `materialize`)
+    def stream(self, factory):
+        assert callable(factory), "pass a function returning the statements, so they can be written again"
+        self.append(Stream(factory))
+        self.lazy = True
+
+    # replace every stream with the statements it produces
+    def materialize(self):
+        for block in list(blocks(self.body)):
+            statements = []
+            for statement in block.statements:
+                if isinstance(statement, Stream):
+                    statements += statement.statements()
+                else:
+                    statements.append(statement)
+            block.statements = statements
+        self.lazy = False
+        self.invalidate()
+
+    # `add` for expression nodes built directly, without parsing tokens
+    def assign(self, place, source):
+        if isinstance(source, int):
+            source = Int(source, place.ty)
+        match place:
+            case GetAttr():
+                statement = SetAttr(place.struct, place.attr, source)
+            case GetItem():
+                statement = SetItem(place.array, place.position, source)
+            case _:
+                statement = Assign(place, source)
+        self.append(statement)
+
+    def run(self, expression):
+        self.append(Run(expression))
 
     @contextmanager
     def block_context(self, block):
@@ -289,8 +811,9 @@ class Function:
 
     def ret(self, *tokens):
         inner = parse(tuple(tokens))
-        assert inner.ty == self.return_type
-        self.active_block.statements.append(Return(inner))
+        if checking.level == STRICT:
+            checking.check_return(self, inner)
+        self.append(Return(inner))
 
     # intentionally duplicate FunctionType.write_declaration
     # the `writer_declaration` contract in this codebase promises to work with any identifier
@@ -300,6 +823,7 @@ class Function:
     # this is a declaration (potentially in global scope)
     #   int (*assignable_add)(int, int);  // later may execute `assignable_add = add;`
     def write_forward_declaration(self, writer):
+        self.write_specifiers(writer)
         self.return_type.write(writer)
         writer.space()
         self.write(writer)
@@ -309,10 +833,38 @@ class Function:
                 variable.ty.write(next(comma_writer))
         writer.write(";")
 
+    def write_specifiers(self, writer):
+        if self.attributes:
+            writer.write(f"__attribute__(({', '.join(self.attributes)}))")
+            writer.space()
+        if self.storage is not None:
+            writer.write(self.storage)
+            writer.space()
+        if self.inline:
+            writer.write("inline")
+            writer.space()
+
     def write(self, writer):
         mangled_name(writer, self.name, self.type_arguments)
 
-    def write_definition(self, writer):
+    def __call__(self, *arguments):
+        return call(self, arguments)
+
+    def forward_declaration(self):
+        if self.forward_declaration_text is None:
+            self.forward_declaration_text = render(self.write_forward_declaration)
+        return self.forward_declaration_text
+
+    def definition(self):
+        if self.lazy:
+            return render(self.write_definition)
+        if self.definition_text is None:
+            self.definition_text = render(self.write_definition)
+        return self.definition_text
+
+    # `body` replaces the function body, as a wrapper of it in `cgen.profile`
+    def write_definition(self, writer, body=None):
+        self.write_specifiers(writer)
         self.return_type.write(writer)
         writer.space()
         mangled_name(writer, self.name, self.type_arguments)
@@ -321,10 +873,12 @@ class Function:
             for variable in self.parameters:
                 variable.write_declaration(next(comma_writer))
         writer.space()
-        self.body.write(writer)
+        (body or self.body).write(writer)
 
 
 class Block:
+    __slots__ = ("statements",)
+
     def __init__(self):
         self.statements = []
 
@@ -337,7 +891,29 @@ class Block:
                 statement.write(next(line_writer))
 
 
-class Variable:
+class Stream:
+    __slots__ = ("factory",)
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def statements(self):
+        for statement in self.factory():
+            yield Run(statement) if isinstance(statement, Expression) else statement
+
+    def write(self, writer):
+        line_writer = writer.lines()
+        empty = True
+        for statement in self.statements():
+            statement.write(next(line_writer))
+            empty = False
+        if empty:
+            writer.write(";")
+
+
+class Variable(Expression):
+    __slots__ = ("name", "ty")
+
     def __init__(self, ty, name):
         self.ty = parse_type(ty)
         self.name = name
@@ -354,6 +930,8 @@ class Variable:
 
 
 class Declare:
+    __slots__ = ("variable",)
+
     def __init__(self, variable):
         self.variable = variable
 
@@ -363,11 +941,18 @@ class Declare:
 
 
 class Assign:
+    __slots__ = ("place", "source")
+
     def __init__(self, place, source):
-        if source.ty:
-            assert place.ty == source.ty, f"assign {generate(place.ty)} with {generate(source.ty)}"
         self.place = place
         self.source = source
+        if checking.level == STRICT:
+            self.check()
+
+    def check(self):
+        check_store(self.place.ty)
+        if self.source.ty and not assignable(self.place.ty, self.source.ty):
+            raise TypeCheckError(f"assign {describe(self.place.ty)} with {describe(self.source.ty)}")
 
     def write(self, writer):
         self.place.write(writer)
@@ -379,10 +964,15 @@ class Assign:
 
 
 class Return:
+    __slots__ = ("inner",)
+
     def __init__(self, inner):
         self.inner = inner
 
     def write(self, writer):
+        if writer.return_exit is not None:
+            write_profiled_return(self.inner, writer)
+            return
         writer.write("return")
         writer.space()
         self.inner.write(writer)
@@ -390,6 +980,8 @@ class Return:
 
 
 class Run:
+    __slots__ = ("inner",)
+
     def __init__(self, inner):
         self.inner = inner
 
@@ -398,19 +990,32 @@ class Run:
         writer.write(";")
 
 
+# `expect` is None, or the likely truth of the condition as a hint for the compiler
+#   if (__builtin_expect(!!(x == 0), 0))
 class IfElse:
-    def __init__(self, condition):
+    __slots__ = ("condition", "expect", "negative", "positive")
+
+    def __init__(self, condition, expect=None):
         self.condition = condition
         self.positive = Block()
         self.negative = Block()
+        self.expect = expect
 
     def write(self, writer):
         writer.write("if")
         writer.space()
         with writer.parentheses():
-            self.condition.write(writer)
+            if self.expect is None:
+                self.condition.write(writer)
+            else:
+                writer.write("__builtin_expect(!!")
+                with writer.parentheses():
+                    self.condition.write(writer)
+                writer.write(f", {int(self.expect)})")
         writer.space()
         self.positive.write(writer)
+        if self.negative is None:  # removed by a pass
+            return
         writer.space()
         writer.write("else")
         writer.space()
@@ -418,6 +1023,8 @@ class IfElse:
 
 
 class While:
+    __slots__ = ("body", "condition")
+
     def __init__(self, condition):
         self.condition = condition
         self.body = Block()
@@ -431,7 +1038,39 @@ class While:
         self.body.write(writer)
 
 
+class Switch:
+    __slots__ = ("cases", "condition")
+
+    def __init__(self, condition):
+        self.condition = condition
+        self.cases = []  # (Int, Block), each case falls through to the next one
+
+    def add_case(self, value):
+        block = Block()
+        self.cases.append((value, block))
+        return block
+
+    def write(self, writer):
+        writer.write("switch")
+        writer.space()
+        with writer.parentheses():
+            self.condition.write(writer)
+        writer.space()
+        with writer.braces():
+            if not self.cases:
+                writer.write(";")
+            for (value, block), line_writer in zip(self.cases, writer.lines()):
+                line_writer.write("case")
+                line_writer.space()
+                value.write(line_writer)
+                line_writer.write(":")
+                line_writer.space()
+                block.write(line_writer)
+
+
 class Label:
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
@@ -440,6 +1079,8 @@ class Label:
 
 
 class Goto:
+    __slots__ = ("label",)
+
     def __init__(self, label=None):
         self.label = label
 
@@ -450,20 +1091,27 @@ class Goto:
         writer.write(f"{self.label.name};")
 
 
-class Call:
+class Call(Expression):
+    __slots__ = ("arguments", "callee", "ty")
+
     def __init__(self, callee, arguments):
-        callee_type = callee.ty
-        if callee_type:
-            assert isinstance(callee_type, FunctionType)
-            assert len(arguments) == len(callee_type.parameter_types)
-            for argument, ty in zip(arguments, callee_type.parameter_types):
-                assert argument.ty == ty
         self.callee = callee
         self.arguments = arguments
+        callee_type = callee.ty
+        self.ty = callee_type.return_type if isinstance(callee_type, FunctionType) else None
+        if checking.level == STRICT:
+            self.check()
 
-    @property
-    def ty(self):
-        return self.callee.ty.return_type
+    def check(self):
+        callee_type = self.callee.ty
+        if callee_type:
+            if not isinstance(callee_type, FunctionType):
+                raise TypeCheckError(f"call {describe(callee_type)}")
+            if len(self.arguments) != len(callee_type.parameter_types):
+                raise TypeCheckError(f"call {describe(self.callee)} with {len(self.arguments)} arguments")
+            for i, (argument, ty) in enumerate(zip(self.arguments, callee_type.parameter_types)):
+                if not assignable(ty, argument.ty):
+                    raise TypeCheckError(f"argument {i} of {describe(self.callee)} is {describe(argument.ty)}")
 
     def write(self, writer):
         self.callee.write(writer)
@@ -473,28 +1121,51 @@ class Call:
                 argument.write(next(comma_writer))
 
 
-class Op:
+class Op(Expression):
+    __slots__ = ("left", "op", "right", "ty")
+
     def __init__(self, op, left, right):
-        if op in ["+", "-", "*", "/", "%"]:
-            assert left.ty == right.ty
-        # TODO: other type checks
         self.op = op
         self.left = left
         self.right = right
+        self.ty = self.result_type()
+        if checking.level == STRICT:
+            self.check()
+
+    # `type(...) is VectorType` here, `isinstance` through the metaclass is several times slower
+    # and these run for every operator
+    def check(self):
+        if self.op == "sizeof":
+            return
+        left_type = None if self.left is None else self.left.ty
+        if type(left_type) is VectorType or type(self.right.ty) is VectorType:
+            check_vector_op(self.op, self.left is None, left_type, self.right.ty)
+        elif self.op in ["+", "-", "*", "/", "%"] and self.left.ty != self.right.ty:
+            raise TypeCheckError(f"{describe(self.left.ty)} {self.op} {describe(self.right.ty)}")
+        # TODO: other type checks
 
     @classmethod
     def unary(cls, op, right):
         return cls(op, None, right)
 
-    @property
-    def ty(self):
+    def result_type(self):
         if self.op == "sizeof":
             return USIZE
-        if self.op == "&" and not self.left:
-            return Pointer(self.right.ty)
-        if self.op in ("==", "!=", ">", ">=", "<", "<="):
+        if self.left is None:
+            match self.op:
+                case "&":
+                    return self.right.ty and Pointer(self.right.ty)
+                case "!":
+                    return INT
+            return self.right.ty
+        if self.op in ("&&", "||"):
             return INT
-        return self.left.ty  # TODO: complete the cases
+        left_type, right_type = self.left.ty, self.right.ty
+        if left_type is not right_type and type(right_type) is VectorType:
+            left_type = right_type  # with the scalar on the left broadcast
+        if self.op in COMPARISONS:
+            return left_type.mask_type() if type(left_type) is VectorType else INT
+        return left_type  # TODO: complete the cases
 
     def write(self, writer):
         if self.left:
@@ -508,20 +1179,49 @@ class Op:
             self.right.write(writer)
 
 
-class GetItem:
+COMPARISONS = ("==", "!=", ">", ">=", "<", "<=")
+VECTOR_OPS = ("+", "-", "*", "/", "%", "&", "|", "^", "<<", ">>", *COMPARISONS)
+INTEGER_VECTOR_OPS = ("%", "&", "|", "^", "<<", ">>", "~")
+
+
+# operands are the vector type or, broadcast, its lane type
+def check_vector_op(op, unary, left_type, right_type):
+    vector_type = left_type if isinstance(left_type, VectorType) else right_type
+    if unary:
+        if op == "&":
+            return
+        supported = op in ("-", "~")
+    else:
+        supported = op in VECTOR_OPS
+        supported &= all(ty in (None, vector_type, vector_type.inner) for ty in (left_type, right_type))
+    if not supported or (op in INTEGER_VECTOR_OPS and vector_type.inner.name in FLOATS):
+        left = "" if unary else f"{describe(left_type)} "
+        raise TypeCheckError(f"{left}{op} {describe(right_type)}")
+
+
+def check_index(array_type, position):
+    if array_type and not isinstance(array_type, (Array, Pointer, VectorType)):
+        raise TypeCheckError(f"index into {describe(array_type)}")
+    if position.ty and position.ty != USIZE:
+        raise TypeCheckError(f"index with {describe(position.ty)}")
+    lanes = array_type.lanes if type(array_type) is VectorType else None
+    if lanes and isinstance(position, Int) and not 0 <= position.value < lanes:
+        raise TypeCheckError(f"lane {position.value} of {describe(array_type)}")
+
+
+class GetItem(Expression):
+    __slots__ = ("array", "position", "ty")
+
     def __init__(self, array, position):
-        array_type = array.ty
-        if array_type:
-            assert isinstance(array_type, (Array, Pointer))
-        position_type = position.ty
-        if position_type:
-            assert position_type == USIZE
         self.array = array
         self.position = position
+        array_type = array.ty
+        self.ty = unqualified(array_type.inner) if isinstance(array_type, (Array, Pointer, VectorType)) else None
+        if checking.level == STRICT:
+            self.check()
 
-    @property
-    def ty(self):
-        return self.array.ty.inner
+    def check(self):
+        check_index(self.array.ty, self.position)
 
     def write(self, writer):
         self.array.write(writer)
@@ -530,19 +1230,23 @@ class GetItem:
 
 
 class SetItem:
+    __slots__ = ("array", "position", "source")
+
     def __init__(self, array, position, source):
-        array_type = array.ty
-        if array_type:
-            assert isinstance(array_type, (Array, Pointer))
-            source_type = source.ty
-            if source_type:
-                assert source_type == array_type.inner
-        position_type = position.ty
-        if position_type:
-            assert position_type == USIZE
         self.array = array
         self.position = position
         self.source = source
+        if checking.level == STRICT:
+            self.check()
+
+    def check(self):
+        array_type = self.array.ty
+        check_index(array_type, self.position)
+        if array_type:
+            check_store(array_type.inner)
+        source_type = self.source.ty
+        if array_type and source_type and not assignable(array_type.inner, source_type):
+            raise TypeCheckError(f"store {describe(source_type)} into {describe(array_type)}")
 
     def write(self, writer):
         self.array.write(writer)
@@ -555,23 +1259,37 @@ class SetItem:
         writer.write(";")
 
 
-class GetAttr:
+# (arrow, struct type) of a field access on an expression of type `ty`
+def field_access(ty):
+    if isinstance(ty, Pointer):
+        return True, unqualified(ty.inner)
+    return False, unqualified(ty)
+
+
+def check_field(struct_type, attr):
+    if struct_type:
+        if not isinstance(struct_type, Struct):
+            raise TypeCheckError(f"field {attr} of {describe(struct_type)}")
+        if attr not in struct_type.field_index:
+            raise TypeCheckError(f"no field {attr}")
+
+
+class GetAttr(Expression):
+    __slots__ = ("arrow", "attr", "struct", "ty")
+
     def __init__(self, struct, attr):
-        self.ty = None
-        struct_type = struct.ty
-        if struct_type and isinstance(struct_type, Pointer):
-            self.arrow = True
-            struct_type = struct_type.inner
-        else:
-            self.arrow = False
-        if struct_type:
-            assert isinstance(struct_type, Struct)
-            for ty, name in struct_type.fields:
-                if name == attr:
-                    self.ty = ty
-            assert self.ty
         self.struct = struct
         self.attr = attr
+        self.arrow, struct_type = field_access(struct.ty)
+        self.ty = None
+        if isinstance(struct_type, Struct) and attr in struct_type.field_index:
+            self.ty = unqualified(struct_type.field_index[attr][1])
+        elif checking.level == STRICT:  # the field was found otherwise
+            self.check()
+
+    def check(self):
+        _, struct_type = field_access(self.struct.ty)
+        check_field(struct_type, self.attr)
 
     def write(self, writer):
         self.struct.write(writer)
@@ -582,20 +1300,25 @@ class GetAttr:
 
 
 class SetAttr:
+    __slots__ = ("arrow", "attr", "source", "struct")
+
     def __init__(self, struct, attr, source):
-        struct_type = struct.ty
-        if struct_type and isinstance(struct_type, Pointer):
-            self.arrow = True
-            struct_type = struct_type.inner
-        else:
-            self.arrow = False
-        if struct_type:
-            assert isinstance(struct_type, Struct)
-            field_type = next(ty for ty, name in struct_type.fields if name == attr)
-            assert source.ty == field_type
         self.struct = struct
         self.attr = attr
         self.source = source
+        self.arrow, _ = field_access(struct.ty)
+        if checking.level == STRICT:
+            self.check()
+
+    def check(self):
+        _, struct_type = field_access(self.struct.ty)
+        check_field(struct_type, self.attr)
+        if struct_type:
+            check_store(self.struct.ty.inner if self.arrow else self.struct.ty)
+            _, field_type = struct_type.field_index[self.attr]
+            check_store(field_type)
+            if not assignable(field_type, self.source.ty):
+                raise TypeCheckError(f"assign {describe(self.source.ty)} to field {self.attr}")
 
     def write(self, writer):
         self.struct.write(writer)
@@ -610,7 +1333,9 @@ class SetAttr:
         writer.write(";")
 
 
-class Cast:
+class Cast(Expression):
+    __slots__ = ("inner", "ty")
+
     def __init__(self, ty, inner):
         # TODO: check cast validity
         self.ty = ty
@@ -624,6 +1349,8 @@ class Cast:
 
 
 class Include:
+    __slots__ = ("name", "system")
+
     def __init__(self, name, *, system=True):
         self.name = name
         self.system = system
@@ -642,31 +1369,129 @@ class Include:
         return hash((self.name, self.system))
 
 
+# `block` and every block nested in it, outermost first
+def blocks(block):
+    yield block
+    for statement in block.statements:
+        match statement:
+            case Block():
+                yield from blocks(statement)
+            case IfElse():
+                yield from blocks(statement.positive)
+                if statement.negative is not None:
+                    yield from blocks(statement.negative)
+            case While():
+                yield from blocks(statement.body)
+            case Switch():
+                for _, case in statement.cases:
+                    yield from blocks(case)
+
+
+# `block` with copies of the blocks and control statements nested in it, which passes change in
+# place; other statements and expressions are shared as they are rebuilt instead
+def copy_block(block):
+    copied = Block()
+    copied.statements = [copy_statement(statement) for statement in block.statements]
+    return copied
+
+
+def copy_statement(statement):
+    match statement:
+        case Block():
+            return copy_block(statement)
+        case IfElse():
+            copied = copy.copy(statement)
+            copied.positive = copy_block(statement.positive)
+            if statement.negative is not None:
+                copied.negative = copy_block(statement.negative)
+            return copied
+        case While():
+            copied = copy.copy(statement)
+            copied.body = copy_block(statement.body)
+            return copied
+        case Switch():
+            copied = copy.copy(statement)
+            copied.cases = [(value, copy_block(case)) for value, case in statement.cases]
+            return copied
+    return statement
+
+
 class SourceCode:
     def __init__(self):
-        self.includes = set()
-        self.structs = []
+        self.includes = {}  # used as an ordered set, so the output does not depend on hashing
+        self.structs = []  # and `VectorType` typedefs, defined before the functions
         self.functions = []
+        # generated name -> added struct or function, so shared instantiations are emitted once
+        self.names = {}
+        # added compound items such as `Vec(I32)`, kept alive so that instantiating them again while
+        # building this source gives the same objects (interned instances are only held weakly)
+        self.compounds = []
+        # callables taking a `Function`, run on a copy of every function before it is emitted
+        # see `cgen.passes` and `Function.with_passes`
+        self.passes = []
+        # None, or "clock" or "rdtsc" to count calls and time of every function, see `cgen.profile`
+        self.profile = None
 
     def add(self, item):
         match item:
             case Include():
-                self.includes.add(item)
-            case Struct():
+                self.includes[item] = None
+            case Struct() | VectorType() if self.add_name(item):
                 self.structs.append(item)
-            case Function():
+            case Function() if self.add_name(item):
                 self.functions.append(item)
+            case Struct() | VectorType() | Function():
+                pass
             case compound_item:
+                self.compounds.append(compound_item)
                 for item in compound_item.items():
                     self.add(item)
 
-    def write(self, writer):
+    # whether `item` is new, a different item of the same name would be a redefinition in C
+    def add_name(self, item):
+        name = generate(item)
+        added = self.names.get(name)
+        if added is None:
+            self.names[name] = item
+            return True
+        if added is not item:
+            raise ValueError(f"{name} is defined by two different items")
+        return False
+
+    # verify the changed functions and render them as emitted, with the passes run; returns the
+    # functions to emit, in place of `functions`
+    def prepare(self, *, jobs=None):
+        if checking.level == checking.DEFERRED:
+            # by the flag rather than the cached text, which may have been rendered under OFF
+            pending = [item for item in self.functions if not item.verified]
+            checking.verify(pending)
+            for item in pending:
+                item.verified = True
+        functions = [item.with_passes(self.passes) for item in self.functions]
+        if jobs:
+            render_definitions(functions, jobs)
+        return functions
+
+    def write(self, writer, *, jobs=None):
+        if self.profile:
+            write_profiled(self, self.prepare(), writer, jobs=jobs)
+            return
+        functions = self.prepare(jobs=jobs)
         for item in self.includes:
             item.write(writer)
         line_writer = writer.lines()
         for item in self.structs:
-            item.writer_definition(next(line_writer))
-        for item in self.functions:
-            item.write_forward_declaration(next(line_writer))
+            next(line_writer).write(item.definition())
         for item in self.functions:
-            item.write_definition(next(line_writer))
+            next(line_writer).write(item.forward_declaration())
+        for item in functions:
+            if item.lazy:
+                item.write_definition(next(line_writer))
+            else:
+                next(line_writer).write(item.definition())
+
+
+if os.environ.get("CGEN_INSTRUMENT"):
+    from cgen.instrument import enable_from_environment
+
+    enable_from_environment()
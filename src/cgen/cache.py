@@ -0,0 +1,134 @@
+# content addressed cache of compiled shared objects, and loading them with ctypes
+#   lib = load(source)
+#   lib.fib(10)
+# the key is the sha256 of the generated source, the compiler identity (`cc --version`) and the
+# flags; entries live in $CGEN_CACHE_DIR or ~/.cache/cgen and the least recently used ones are
+# evicted once the directory grows over `max_bytes`
+import contextlib
+import ctypes
+import hashlib
+import os
+import subprocess
+import tempfile
+
+from cgen import CHAR, I32, INT, U8, U32, U64, UNIT, USIZE, Pointer, Primitive, Qualified, unqualified
+from cgen.harness import DEFAULT_FLAGS, compile_in, find_compiler
+from cgen.writer import generate
+
+MAX_BYTES = 256 * 2**20
+SHARED_FLAGS = ("-shared", "-fPIC")
+
+CTYPES = {
+    UNIT: None,
+    I32: ctypes.c_int32,
+    U8: ctypes.c_uint8,
+    U32: ctypes.c_uint32,
+    U64: ctypes.c_uint64,
+    USIZE: ctypes.c_size_t,
+    INT: ctypes.c_int,
+    CHAR: ctypes.c_char,
+}
+
+compiler_identities = {}
+
+
+def cache_directory():
+    return os.environ.get("CGEN_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "cgen")
+
+
+def compiler_identity(cc):
+    if cc not in compiler_identities:
+        result = subprocess.run([cc, "--version"], capture_output=True, text=True, check=False)
+        compiler_identities[cc] = result.stdout
+    return compiler_identities[cc]
+
+
+def cache_key(text, cc, flags):
+    digest = hashlib.sha256()
+    for part in (text, compiler_identity(cc), *flags):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# path of the shared object built from `source`, compiled on a miss
+def compile_cached(source, *, cc=None, flags=DEFAULT_FLAGS, directory=None, max_bytes=MAX_BYTES):
+    cc = find_compiler(cc)
+    directory = directory or cache_directory()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, cache_key(generate(source), cc, flags) + ".so")
+    if os.path.exists(path):
+        os.utime(path)  # mark as recently used
+        return path
+    # built next to the cache so the final rename is atomic, concurrent builds of the same key
+    # just replace each other with the same content
+    with tempfile.TemporaryDirectory(prefix="build-", dir=directory) as build_directory:
+        build = compile_in(source, build_directory, cc=cc, flags=flags, name="kernel", output_flags=SHARED_FLAGS)
+        os.replace(build.path, path)
+    evict(directory, max_bytes, keep=path)
+    return path
+
+
+# remove the least recently used entries but `keep` until the total size fits
+def evict(directory, max_bytes, keep=None):
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(".so") and os.path.join(directory, name) != keep:
+            stat = os.stat(os.path.join(directory, name))
+            entries.append((stat.st_mtime, name, stat.st_size))
+    total = sum(size for _, _, size in entries) + (os.path.getsize(keep) if keep else 0)
+    for _, name, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        with contextlib.suppress(FileNotFoundError):  # evicted by another process
+            os.remove(os.path.join(directory, name))
+        total -= size
+
+
+def ctype(ty):
+    match ty:
+        case Primitive() if ty in CTYPES:
+            return CTYPES[ty]
+        case Qualified():
+            return ctype(ty.inner)
+        case Pointer(inner=inner) if unqualified(inner) is CHAR:
+            return ctypes.c_char_p
+        case Pointer(inner=inner) if ctype(inner) is None:
+            return ctypes.c_void_p
+        case Pointer(inner=inner):
+            return ctypes.POINTER(ctype(inner))
+    # structs passed by value, function pointers and the like
+    return None
+
+
+class Library:
+    def __init__(self, path, functions):
+        self.path = path
+        self.library = ctypes.CDLL(path)
+        self.functions = {}  # generated name -> ctypes function
+        for function in functions:
+            if not function.exported:
+                continue
+            name = generate(function)
+            argtypes = [ctype(parameter.ty) for parameter in function.parameters]
+            restype = ctype(function.return_type)
+            if None in argtypes or (restype is None and function.return_type is not UNIT):
+                continue
+            c_function = getattr(self.library, name)
+            c_function.argtypes = argtypes
+            c_function.restype = restype
+            self.functions[name] = c_function
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["functions"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+# the functions of `source` as ctypes callables, as attributes of the result; static and plain inline
+# functions and functions with parameter or return types that have no ctypes counterpart (structs by
+# value) are left out
+def load(source, *, cc=None, flags=DEFAULT_FLAGS, directory=None, max_bytes=MAX_BYTES):
+    path = compile_cached(source, cc=cc, flags=flags, directory=directory, max_bytes=max_bytes)
+    return Library(path, source.functions)
@@ -0,0 +1,131 @@
+# how the type checks of nodes are run
+#   STRICT   in every constructor, failing at the faulty node (default)
+#   DEFERRED once before emission, `SourceCode.write` verifies the functions changed since they
+#            were last verified, even if their text was rendered under another level, and reports
+#            all errors together
+#   OFF      never, for generators that are already validated
+# the level is also read from the CGEN_CHECK environment variable on import
+#
+# checks raise `TypeCheckError` explicitly, so unlike plain `assert` they stay with `python -O`
+import os
+from contextlib import contextmanager
+
+import cgen  # partially initialized here, the classes are looked up on use
+
+STRICT = "strict"
+DEFERRED = "deferred"
+OFF = "off"
+LEVELS = (STRICT, DEFERRED, OFF)
+
+level = os.environ.get("CGEN_CHECK", STRICT)
+assert level in LEVELS, f"unknown check level {level}"
+
+
+class TypeCheckError(AssertionError):
+    pass
+
+
+def describe(ty):
+    return "unchecked" if ty is None else cgen.generate(ty)
+
+
+def set_level(new_level):
+    global level  # noqa: PLW0603
+    assert new_level in LEVELS, f"unknown check level {new_level}"
+    level = new_level
+
+
+@contextmanager
+def checks(new_level):
+    previous_level = level
+    set_level(new_level)
+    try:
+        yield
+    finally:
+        set_level(previous_level)
+
+
+def node_visits():
+    return {
+        cgen.Block: (None, lambda node: node.statements),
+        cgen.IfElse: (
+            None,
+            lambda node: [node.condition, node.positive] + ([node.negative] if node.negative is not None else []),
+        ),
+        cgen.While: (None, lambda node: [node.condition, node.body]),
+        cgen.Switch: (None, lambda node: [node.condition, *(block for _, block in node.cases)]),
+        cgen.Declare: (None, lambda node: [node.variable]),
+        cgen.Assign: (cgen.Assign.check, lambda node: [node.place, node.source]),
+        cgen.Return: (None, lambda node: [node.inner]),
+        cgen.Run: (None, lambda node: [node.inner]),
+        cgen.Cast: (None, lambda node: [node.inner]),
+        cgen.Call: (cgen.Call.check, lambda node: [node.callee, *node.arguments]),
+        cgen.Op: (cgen.Op.check, lambda node: [node.right] if node.left is None else [node.left, node.right]),
+        cgen.GetItem: (cgen.GetItem.check, lambda node: [node.array, node.position]),
+        cgen.SetItem: (cgen.SetItem.check, lambda node: [node.array, node.position, node.source]),
+        cgen.GetAttr: (cgen.GetAttr.check, lambda node: [node.struct]),
+        cgen.SetAttr: (cgen.SetAttr.check, lambda node: [node.struct, node.source]),
+    }
+
+
+# (check, children) of the nodes of exactly `node_type`, with None for either when there are
+# none; looked up by type, since going through the classes for every node made `verify` several
+# times slower than the same checks run in the constructors
+visits = {}
+
+
+def visit(node_type):
+    if not visits:
+        visits.update(node_visits())
+    for base in node_type.__mro__:
+        if base in visits:
+            check, node_children = visits[base]
+            break
+    else:
+        # leaves, and functions referred to by calls which are checked on their own
+        check, node_children = getattr(node_type, "check", None), None
+    visits[node_type] = check, node_children
+    return check, node_children
+
+
+def children(node):
+    _, node_children = visits.get(type(node)) or visit(type(node))
+    return [] if node_children is None else node_children(node)
+
+
+def function_errors(function, root=None):
+    errors = []
+    pending = [function.body if root is None else root]
+    while pending:  # not recursive, expressions may be nested deeper than the recursion limit
+        node = pending.pop()
+        node_type = type(node)
+        if node_type is cgen.Stream:
+            # one statement at a time, so the stream is not held in memory either
+            for statement in node.statements():
+                errors += function_errors(function, statement)
+            continue
+        check, node_children = visits.get(node_type) or visit(node_type)
+        try:
+            if node_type is cgen.Return:
+                check_return(function, node.inner)
+            elif check is not None:
+                check(node)
+        except TypeCheckError as error:
+            errors.append(f"{function.name}: {error}")
+        if node_children is not None:
+            pending += reversed(node_children(node))
+    return errors
+
+
+def check_return(function, inner):
+    if not cgen.assignable(function.return_type, inner.ty):
+        raise TypeCheckError(f"return {describe(inner.ty)} from {function.name}")
+
+
+# check every function of `item`, a `SourceCode` or a list of functions, and raise one error
+# listing all failures
+def verify(item):
+    functions = item.functions if isinstance(item, cgen.SourceCode) else item
+    errors = [error for function in functions for error in function_errors(function)]
+    if errors:
+        raise TypeCheckError(f"{len(errors)} type errors\n" + "\n".join(errors))
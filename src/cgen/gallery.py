@@ -1,4 +1,5 @@
-from cgen import I32, Function, Int
+from cgen import CHAR, I32, INT, USIZE, Function, FunctionType, Include, Int, Pointer, SourceCode, Variable
+from cgen.vec import Vec
 
 
 def fib():
@@ -19,3 +20,39 @@ def fib():
         f.add(m, "=", (m, "+", Int(1)))
     f.ret(a)
     return f
+
+
+# the `__main__` demo: push 0..n-1 into a `Vec`, with n from command line
+# with `unroll` the loop is unrolled at compile time and n is capped by it
+def vec_main(unroll=None):
+    vec = Vec(I32)
+    atoi = Variable(FunctionType(INT, [Pointer(CHAR)]), "atoi")
+
+    f = Function("main")
+    f.return_type = INT
+    f.add_parameter(INT, "argc")
+    argv = f.add_parameter(("*", ("*", CHAR)), "argv")
+    n = f.declare(I32, "n")
+    f.add(n, "=", ((atoi, [(argv, "[]", Int(1, USIZE))]), "as", I32))
+    v = f.declare(vec.struct, "v")
+    f.add(v, "=", (vec.new, []))
+    if unroll is None:
+        m = f.declare(I32, "m")
+        f.add(m, "=", Int(0))
+        with f.loop(m, "<", n):
+            f.add(vec.push, [("&", v), m])
+            f.add(m, "=", (m, "+", Int(1)))
+    else:
+        for i in range(unroll):
+            m = Int(i, I32)
+            with f.when(m, "<", n):
+                f.add(vec.push, [("&", v), m])
+    f.add(vec.drop, [v])
+    f.ret(Int(0, INT))
+
+    source = SourceCode()
+    source.add(Include("stdio.h"))
+    source.add(Include("stdlib.h"))
+    source.add(vec)
+    source.add(f)
+    return source
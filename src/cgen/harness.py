@@ -0,0 +1,133 @@
+# compile generated source with the local C compiler and time the resulting binary
+#   python3 -m cgen.harness 'cgen.gallery:vec_main()' 'cgen.gallery:vec_main(unroll=100)' -- 100
+import argparse
+import importlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from cgen.writer import generate_to
+
+DEFAULT_FLAGS = ("-O2",)
+
+
+class CompileError(Exception):
+    pass
+
+
+def find_compiler(cc=None):
+    for candidate in (cc, os.environ.get("CC"), "cc", "gcc", "clang"):
+        if candidate and shutil.which(candidate):
+            return candidate
+    raise CompileError("no C compiler found, tried $CC, cc, gcc and clang")
+
+
+class Build:
+    def __init__(self, path, compile_seconds):
+        self.path = path
+        self.compile_seconds = compile_seconds
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+
+def compile_in(source, directory, *, cc=None, flags=DEFAULT_FLAGS, name="main", output_flags=()):
+    cc = find_compiler(cc)
+    source_path = os.path.join(directory, f"{name}.c")
+    with open(source_path, "w") as fp:
+        generate_to(source, fp)
+    output_path = os.path.join(directory, name)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [cc, *flags, *output_flags, "-o", output_path, source_path], capture_output=True, text=True, check=False
+    )
+    compile_seconds = time.perf_counter() - start
+    if result.returncode:
+        raise CompileError(result.stderr)
+    return Build(output_path, compile_seconds)
+
+
+@contextmanager
+def compiled(source, *, cc=None, flags=DEFAULT_FLAGS):
+    with tempfile.TemporaryDirectory(prefix="cgen-") as directory:
+        yield compile_in(source, directory, cc=cc, flags=flags)
+
+
+def run(build, arguments=(), *, repeat=10):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([build.path, *map(str, arguments)], stdout=subprocess.DEVNULL, check=True)
+        seconds.append(time.perf_counter() - start)
+    return {
+        "seconds": seconds,
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+        "stdev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+    }
+
+
+def benchmark(source, arguments=(), *, repeat=10, cc=None, flags=DEFAULT_FLAGS):
+    with compiled(source, cc=cc, flags=flags) as build:
+        result = run(build, arguments, repeat=repeat)
+        result["compile_seconds"] = build.compile_seconds
+        result["binary_bytes"] = build.size
+    return result
+
+
+# "module:expression", the expression evaluates to a `SourceCode` or a callable returning one
+def resolve(target):
+    module_name, _, expression = target.partition(":")
+    module = importlib.import_module(module_name)
+    source = eval(expression, vars(module))  # noqa: S307
+    if callable(source):
+        source = source()
+    return source
+
+
+# text report of `benchmark` results by target
+def summary(results):
+    lines = []
+    for target, result in results.items():
+        lines.append(target)
+        lines.append(f"  compile {result['compile_seconds'] * 1000:10.1f} ms  binary {result['binary_bytes']:10} bytes")
+        lines.append(
+            f"  run     min {result['min'] * 1000:8.2f} ms  median {result['median'] * 1000:8.2f} ms"
+            f"  stdev {result['stdev'] * 1000:8.2f} ms  ({len(result['seconds'])} runs)"
+        )
+    return "".join(line + "\n" for line in lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python3 -m cgen.harness")
+    parser.add_argument("targets", nargs="+", help="module:expression evaluating to a SourceCode")
+    parser.add_argument("--cc")
+    parser.add_argument("--flags", default=" ".join(DEFAULT_FLAGS))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", action="store_true")
+    # everything after "--" is passed to the binaries
+    argv, arguments = sys.argv[1:], []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, arguments = argv[:split], argv[split + 1 :]
+    args = parser.parse_args(argv)
+    results = {}
+    for target in args.targets:
+        results[target] = benchmark(
+            resolve(target), arguments, repeat=args.repeat, cc=args.cc, flags=args.flags.split()
+        )
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        return
+    sys.stdout.write(summary(results))
+
+
+if __name__ == "__main__":
+    main()
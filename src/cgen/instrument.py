@@ -0,0 +1,192 @@
+import atexit
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import cgen
+import cgen.parallel
+from cgen import checking
+from cgen.writer import generate
+
+# classes whose construction is counted, and timed as the "construct" phase; their type checks,
+# in constructors or `checking.verify`, are timed as the "check" phase instead
+NODE_CLASSES = [
+    "Int",
+    "String",
+    "Null",
+    "Block",
+    "Variable",
+    "Declare",
+    "Assign",
+    "Return",
+    "Run",
+    "IfElse",
+    "While",
+    "Switch",
+    "Stream",
+    "Label",
+    "Goto",
+    "Call",
+    "Op",
+    "GetItem",
+    "SetItem",
+    "GetAttr",
+    "SetAttr",
+    "Cast",
+]
+
+active = None
+
+
+class Report:
+    def __init__(self):
+        self.phases = Counter()  # phase -> seconds, excluding nested phases
+        self.nodes = Counter()  # class name -> instances created
+        self.emitted = Counter()  # generated item name -> bytes, of declarations and definitions
+        self.render_seconds = Counter()  # generated function name -> seconds
+        self.stack = []  # [phase, time the phase (re)started]
+
+    def enter(self, phase):
+        now = time.perf_counter()
+        if self.stack:
+            parent = self.stack[-1]
+            self.phases[parent[0]] += now - parent[1]
+        self.stack.append([phase, now])
+
+    def exit(self):
+        now = time.perf_counter()
+        phase, start = self.stack.pop()
+        self.phases[phase] += now - start
+        if self.stack:
+            self.stack[-1][1] = now
+
+    def as_dict(self, top=10):
+        return {
+            "phases": dict(self.phases),
+            "nodes": dict(self.nodes),
+            "emitted_bytes": dict(self.emitted),
+            "slowest_functions": self.render_seconds.most_common(top),
+        }
+
+    def summary(self, top=10):
+        lines = ["phases:"]
+        lines += [f"  {phase:12} {seconds * 1000:10.1f} ms" for phase, seconds in self.phases.most_common()]
+        lines.append(f"nodes: {sum(self.nodes.values())}")
+        lines += [f"  {name:12} {count:10}" for name, count in self.nodes.most_common()]
+        lines.append(f"emitted: {sum(self.emitted.values())} bytes in {len(self.emitted)} items")
+        lines.append(f"slowest {top} functions to render:")
+        lines += [
+            f"  {name:40} {seconds * 1000:10.2f} ms {self.emitted[name]:10} bytes"
+            for name, seconds in self.render_seconds.most_common(top)
+        ]
+        return "\n".join(lines)
+
+
+def timed_phase(phase, method):
+    def wrapper(*args, **kwargs):
+        active.enter(phase)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            active.exit()
+
+    return wrapper
+
+
+def counted_init(name, init):
+    def wrapper(self, *args, **kwargs):
+        active.nodes[name] += 1
+        active.enter("construct")
+        try:
+            init(self, *args, **kwargs)
+        finally:
+            active.exit()
+
+    return wrapper
+
+
+def recorded_render(render, *, timed):
+    def wrapper(item):
+        fresh = timed and item.definition_text is None
+        active.enter("emit")
+        start = time.perf_counter()
+        try:
+            text = render(item)
+        finally:
+            active.exit()
+        name = generate(item)
+        active.emitted[name] += len(text)
+        if fresh:
+            active.render_seconds[name] += time.perf_counter() - start
+        return text
+
+    return wrapper
+
+
+# definitions rendered by worker processes, which never reach the patched `Function.definition`
+# of this one; their bytes are counted when `SourceCode.write` reads them from the cache
+def recorded_parallel(render_in_parallel):
+    def wrapper(items, jobs):
+        active.enter("emit")
+        try:
+            results = render_in_parallel(items, jobs, timed=True)
+        finally:
+            active.exit()
+        for (function, _), (_, seconds) in zip(items, results, strict=True):
+            active.render_seconds[generate(function)] += seconds
+        return [text for text, _ in results]
+
+    return wrapper
+
+
+# (owner, attribute, original value) for every patch in place
+patches = []
+
+
+def patch(owner, attribute, value):
+    patches.append((owner, attribute, owner.__dict__[attribute]))
+    setattr(owner, attribute, value)
+
+
+def enable():
+    global active  # noqa: PLW0603
+    assert active is None, "instrumentation is already enabled"
+    active = Report()
+    patch(cgen, "parse", timed_phase("parse", cgen.parse))
+    for name in NODE_CLASSES:
+        cls = getattr(cgen, name)
+        patch(cls, "__init__", counted_init(name, cls.__init__))
+        if "check" in cls.__dict__:
+            patch(cls, "check", timed_phase("check", cls.check))
+    checking.visits.clear()  # holds the check methods, looked up again after patching
+    patch(cgen.Function, "definition", recorded_render(cgen.Function.definition, timed=True))
+    patch(cgen.Function, "forward_declaration", recorded_render(cgen.Function.forward_declaration, timed=False))
+    patch(cgen.Struct, "definition", recorded_render(cgen.Struct.definition, timed=False))
+    patch(cgen.parallel, "render_in_parallel", recorded_parallel(cgen.parallel.render_in_parallel))
+    return active
+
+
+def disable():
+    global active
+    while patches:
+        owner, attribute, value = patches.pop()
+        setattr(owner, attribute, value)
+    checking.visits.clear()
+    report, active = active, None
+    return report
+
+
+@contextmanager
+def instrument():
+    report = enable()
+    try:
+        yield report
+    finally:
+        disable()
+
+
+# CGEN_INSTRUMENT=1 instruments the whole process and prints the summary to stderr on exit
+def enable_from_environment():
+    report = enable()
+    atexit.register(lambda: sys.stderr.write(report.summary() + "\n"))
@@ -0,0 +1,62 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cgen.profile import ProfiledBody
+from cgen.writer import render
+
+# ranges handed out per worker, more than one so uneven function sizes balance out
+CHUNKS_PER_JOB = 4
+
+worker_items = None
+worker_timed = False
+
+
+def render_definitions(functions, jobs):
+    # fill the definition cache of every changed function using a process pool; the result is
+    # identical to serial rendering since each definition is rendered independently
+    # lazy functions are written directly instead
+    dirty = [function for function in functions if function.definition_text is None and not function.lazy]
+    for function, text in zip(dirty, render_in_parallel([(function, None) for function in dirty], jobs), strict=True):
+        function.definition_text = text
+
+
+# the definitions of (function, index) pairs rendered by `jobs` processes, counted in
+# `cgen_profile_table[index]` unless the index is None (see `cgen.profile`); with `timed` the
+# results are (definition, seconds) pairs instead, for `cgen.instrument`
+def render_in_parallel(items, jobs, *, timed=False):
+    if not items:
+        return []
+    chunk_size = -(-len(items) // (jobs * CHUNKS_PER_JOB))
+    ranges = [(start, min(start + chunk_size, len(items))) for start in range(0, len(items), chunk_size)]
+    # with fork workers inherit the functions instead of unpickling them
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(jobs, mp_context=context, initializer=init_worker, initargs=(items, timed)) as pool:
+        return [text for texts in pool.map(render_range, ranges) for text in texts]
+
+
+def init_worker(items, timed):
+    global worker_items, worker_timed  # noqa: PLW0603
+    worker_items = items
+    worker_timed = timed
+
+
+def render_range(bounds):
+    start, stop = bounds
+    if not worker_timed:
+        return [render_item(function, index) for function, index in worker_items[start:stop]]
+    results = []
+    for function, index in worker_items[start:stop]:
+        start_time = time.perf_counter()
+        text = render_item(function, index)
+        results.append((text, time.perf_counter() - start_time))
+    return results
+
+
+def render_item(function, index):
+    if index is None:
+        return render(function.write_definition)
+    return render(lambda writer: function.write_definition(writer, ProfiledBody(function, index)))
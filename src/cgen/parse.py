@@ -1,11 +1,12 @@
-def parse(tokens):
-    from cgen import Assign, Call, Cast, GetAttr, GetItem, Op, SetAttr, SetItem
+import cgen  # partially initialized here, the classes are looked up on use
+
 
+def parse(tokens):
     if not isinstance(tokens, tuple):
         return tokens
+    if len(tokens) == 1:
+        return parse(tokens[0])
     match tokens:
-        case (token,):
-            return token
         case (
             left,
             "+"
@@ -28,42 +29,44 @@ def parse(tokens):
             | "<=" as op,
             right,
         ):
-            return Op(op, parse(left), parse(right))
+            return cgen.Op(op, parse(left), parse(right))
         case inner, "as", ty:
-            return Cast(parse_type(ty), parse(inner))
+            return cgen.Cast(parse_type(ty), parse(inner))
         case "&" | "sizeof" | "~" | "!" as op, right:
-            return Op.unary(op, parse(right))
+            return cgen.Op.unary(op, parse(right))
         case callee, list([*arguments]):
-            return Call(parse(callee), [parse(argument) for argument in arguments])
+            return cgen.Call(parse(callee), [parse(argument) for argument in arguments])
         case struct, dot_attr if dot_attr.startswith("."):
-            return GetAttr(parse(struct), dot_attr.removeprefix("."))
+            return cgen.GetAttr(parse(struct), dot_attr.removeprefix("."))
         case array, "[]", position:
-            return GetItem(parse(array), parse(position))
+            return cgen.GetItem(parse(array), parse(position))
         case place, "=", source:
-            return Assign(parse(place), parse(source))
+            return cgen.Assign(parse(place), parse(source))
         case struct, dot_attr, "=", source if dot_attr.startswith("."):
-            return SetAttr(parse(struct), dot_attr.removeprefix("."), parse(source))
+            return cgen.SetAttr(parse(struct), dot_attr.removeprefix("."), parse(source))
         case array, "[]", position, "=", source:
-            return SetItem(parse(array), parse(position), parse(source))
+            return cgen.SetItem(parse(array), parse(position), parse(source))
         case _:
             raise ValueError(tokens)
 
 
 def parse_type(tokens):
-    from cgen import Array, FunctionType, Pointer
-
     if not isinstance(tokens, tuple):
         return tokens
+    if len(tokens) == 1:
+        return parse_type(tokens[0])
     match tokens:
-        case (token,):
-            return token
         # using Rust order here which is much more obvious then C
         case "*", inner:
-            return Pointer(parse_type(inner))
+            return cgen.Pointer(parse_type(inner))
+        case "*", *qualifiers, inner if all(qualifier in cgen.QUALIFIERS for qualifier in qualifiers):
+            return cgen.Pointer(parse_type(inner), qualifiers)
+        case *qualifiers, inner if all(qualifier in ("const", "volatile") for qualifier in qualifiers):
+            return cgen.Qualified(parse_type(inner), qualifiers)
         case inner, "[]", length:
-            return Array(parse_type(inner), length)
+            return cgen.Array(parse_type(inner), length)
         case list([*parameter_types]), "->", return_type:
-            return FunctionType(
+            return cgen.FunctionType(
                 parse_type(return_type), [parse_type(parameter_type) for parameter_type in parameter_types]
             )
         case _:
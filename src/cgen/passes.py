@@ -0,0 +1,369 @@
+from operator import is_not
+
+from cgen import (
+    I32,
+    INT,
+    U8,
+    U32,
+    U64,
+    USIZE,
+    Assign,
+    Block,
+    Call,
+    Cast,
+    Declare,
+    GetAttr,
+    GetItem,
+    Goto,
+    IfElse,
+    Int,
+    Label,
+    Op,
+    Return,
+    Run,
+    SetAttr,
+    SetItem,
+    SourceCode,
+    Switch,
+    While,
+    blocks,
+)
+from cgen.checking import OFF, checks
+
+# (bits, signed) assumed for folding; `int` is taken as 32 bits, and `size_t` results are only
+# folded below 2^32 so the folded value is the same on every target
+WIDTHS = {INT: (32, True), I32: (32, True), U8: (8, False), U32: (32, False), U64: (64, False), USIZE: (32, False)}
+# unsigned types at least as wide as `int`, where C arithmetic wraps around
+WRAPPING = (U32, U64)
+
+COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+# the value as the C expression of type `ty` evaluates to it, or None if that is overflow, not
+# portable, or (for `uint8_t`, which is promoted to `int`) not representable in `ty`
+def fit(value, ty):
+    bits, signed = WIDTHS[ty]
+    if ty in WRAPPING:
+        return value % (1 << bits)
+    low, high = (-(1 << (bits - 1)), 1 << (bits - 1)) if signed else (0, 1 << bits)
+    return value if low <= value < high else None
+
+
+def truncated_division(a, b):
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def evaluate(op, left, right, ty):
+    a, b = left.value, right.value
+    if op in COMPARISONS:
+        # mixing signedness converts negative operands in C, skip these
+        if left.ty is not right.ty and (a < 0 or b < 0):
+            return None
+        return int(COMPARISONS[op](a, b))
+    if op == "&&":
+        return int(bool(a) and bool(b))
+    if op == "||":
+        return int(bool(a) or bool(b))
+    if op in ("<<", ">>"):
+        bits, _ = WIDTHS[ty]
+        if not 0 <= b < max(bits, 32) or a < 0:
+            return None
+        return fit(a << b if op == "<<" else a >> b, ty)
+    if left.ty is not right.ty:
+        return None
+    if op in ("/", "%"):
+        if b == 0:
+            return None
+        quotient = truncated_division(a, b)
+        return fit(quotient if op == "/" else a - b * quotient, ty)
+    operations = {
+        "+": lambda: a + b,
+        "-": lambda: a - b,
+        "*": lambda: a * b,
+        "&": lambda: a & b,
+        "|": lambda: a | b,
+        "^": lambda: a ^ b,
+    }
+    if op not in operations:
+        return None
+    return fit(operations[op](), ty)
+
+
+def pure(expression):
+    match expression:
+        case Call():
+            return False
+        case Op():
+            return (expression.left is None or pure(expression.left)) and pure(expression.right)
+        case GetItem():
+            return pure(expression.array) and pure(expression.position)
+        case GetAttr():
+            return pure(expression.struct)
+        case Cast():
+            return pure(expression.inner)
+    return True
+
+
+def constant(expression, *values):
+    return isinstance(expression, Int) and (not values or expression.value in values)
+
+
+# x + 0, x * 1, x << 0 and the like, with both sides of the same type so the type is kept
+def simplify(op, left, right):
+    if left.ty is not right.ty and op not in ("<<", ">>"):
+        return None
+    if op in ("+", "|", "^", "-", "<<", ">>") and constant(right, 0):
+        return left
+    if op in ("+", "|", "^") and constant(left, 0):
+        return right
+    if op in ("*", "/") and constant(right, 1):
+        return left
+    if op == "*" and constant(left, 1):
+        return right
+    if op in ("*", "&") and (constant(left, 0) or constant(right, 0)) and pure(left) and pure(right):
+        ty = left.ty
+        if ty in WIDTHS:
+            return Int(0, ty)
+    return None
+
+
+def fold_op(expression):
+    op, left, right = expression.op, expression.left, expression.right
+    if left is None:
+        if not constant(right):
+            return expression
+        if op == "!":
+            return Int(int(not right.value), INT)
+        if op == "~" and right.ty in (INT, I32, U32, U64):
+            value = fit(~right.value, right.ty)
+            return expression if value is None else Int(value, right.ty)
+        return expression
+    # short circuit: the right side is not evaluated anyway
+    if op == "&&" and constant(left, 0):
+        return Int(0, expression.ty)
+    if op == "||" and constant(left) and left.value != 0:
+        return Int(1, expression.ty)
+    if constant(left) and constant(right):
+        ty = expression.ty
+        if ty not in WIDTHS:
+            return expression
+        value = evaluate(op, left, right, ty)
+        return expression if value is None else Int(value, ty)
+    return simplify(op, left, right) or expression
+
+
+# nodes may be shared with other functions (or be interned), so changed nodes are rebuilt
+# instead of modified
+def fold(expression):
+    match expression:
+        case Op():
+            left = None if expression.left is None else fold(expression.left)
+            right = fold(expression.right)
+            if left is not expression.left or right is not expression.right:
+                expression = Op(expression.op, left, right)
+            return fold_op(expression)
+        case Call():
+            arguments = [fold(argument) for argument in expression.arguments]
+            if any(map(is_not, arguments, expression.arguments)):
+                return Call(expression.callee, arguments)
+        case GetItem():
+            array, position = fold(expression.array), fold(expression.position)
+            if array is not expression.array or position is not expression.position:
+                return GetItem(array, position)
+        case GetAttr():
+            struct = fold(expression.struct)
+            if struct is not expression.struct:
+                return GetAttr(struct, expression.attr)
+        case Cast():
+            inner = fold(expression.inner)
+            if constant(inner) and expression.ty in WIDTHS and inner.ty in WIDTHS:
+                value = fit(inner.value, expression.ty)
+                if value == inner.value:
+                    return Int(value, expression.ty)
+            if inner is not expression.inner:
+                return Cast(expression.ty, inner)
+    return expression
+
+
+def has_label(block):
+    return any(isinstance(statement, Label) for inner in blocks(block) for statement in inner.statements)
+
+
+def contains_label(statement):
+    holder = Block()
+    holder.statements = [statement]
+    return has_label(holder)
+
+
+def fold_statement(statement):
+    match statement:
+        case Assign():
+            place, source = fold(statement.place), fold(statement.source)
+            if place is not statement.place or source is not statement.source:
+                return Assign(place, source)
+        case SetItem():
+            array, position, source = fold(statement.array), fold(statement.position), fold(statement.source)
+            if array is not statement.array or position is not statement.position or source is not statement.source:
+                return SetItem(array, position, source)
+        case SetAttr():
+            struct, source = fold(statement.struct), fold(statement.source)
+            if struct is not statement.struct or source is not statement.source:
+                return SetAttr(struct, statement.attr, source)
+        case Return() | Run():
+            inner = fold(statement.inner)
+            if inner is not statement.inner:
+                return type(statement)(inner)
+    return statement
+
+
+def fold_block(block):
+    statements = []
+    for original in block.statements:
+        statement = fold_statement(original)
+        match statement:
+            case Block():
+                fold_block(statement)
+            case Switch():
+                statement.condition = fold(statement.condition)
+                for _, case in statement.cases:
+                    fold_block(case)
+            case While():
+                statement.condition = fold(statement.condition)
+                fold_block(statement.body)
+                # a jump into the loop would need it
+                if constant(statement.condition, 0) and not has_label(statement.body):
+                    continue
+            case IfElse():
+                statement.condition = fold(statement.condition)
+                fold_block(statement.positive)
+                negative = statement.negative or Block()
+                fold_block(negative)
+                if constant(statement.condition):
+                    taken, dropped = statement.positive, negative
+                    if statement.condition.value == 0:
+                        taken, dropped = dropped, taken
+                    if not has_label(dropped):
+                        statements += inline(taken)
+                        continue
+        statements.append(statement)
+    block.statements = statements
+
+
+# the statements replacing a block, which keeps its own scope only if it declares something
+def inline(block):
+    if not block.statements:
+        return []
+    if any(isinstance(statement, Declare) for statement in block.statements):
+        return [block]
+    return block.statements
+
+
+# a pass is any callable that takes a `Function` and rewrites its body in place, calling
+# `Function.invalidate` afterwards; run them with `run_passes` or add them to `SourceCode.passes`
+
+
+# passes need the whole body, `SourceCode.write` skips lazy functions instead
+def check_materialized(function):
+    if function.lazy:
+        raise ValueError(f"{function.name} has streamed statements, call `materialize` first")
+
+
+# fold constant expressions of `function` in place, following the width and signedness of `Int.ty`,
+# simplify arithmetic identities and drop branches on a constant condition
+def fold_constants(function):
+    check_materialized(function)
+    with checks(OFF):  # the nodes were checked (or not) when they were built
+        fold_block(function.body)
+    function.invalidate()
+
+
+# a pass that rewrites the statement list of every block on its own
+class BlockPass:
+    def __call__(self, function):
+        check_materialized(function)
+        self.prepare(function)
+        for block in list(blocks(function.body)):
+            block.statements = self.rewrite(block.statements)
+        function.invalidate()
+
+    def prepare(self, function):
+        pass
+
+    def rewrite(self, statements):
+        return statements
+
+
+class RemoveEmptyElse(BlockPass):
+    def rewrite(self, statements):
+        for statement in statements:
+            if isinstance(statement, IfElse) and statement.negative and not statement.negative.statements:
+                statement.negative = None
+        return statements
+
+
+# accesses to a volatile place are side effects of their own, these are kept
+class RemoveSelfAssignment(BlockPass):
+    def rewrite(self, statements):
+        return [
+            statement
+            for statement in statements
+            if not (
+                isinstance(statement, Assign)
+                and statement.place is statement.source
+                and "volatile" not in getattr(statement.place.ty, "qualifiers", ())
+            )
+        ]
+
+
+# statements after `return` or `goto` up to the next label, which may be jumped to; declarations
+# are kept since the scope continues past the label, and so are statements with labels inside
+class RemoveUnreachable(BlockPass):
+    def rewrite(self, statements):
+        result = []
+        reachable = True
+        for statement in statements:
+            if isinstance(statement, Label):
+                reachable = True
+            if reachable or isinstance(statement, Declare) or contains_label(statement):
+                result.append(statement)
+            if isinstance(statement, (Return, Goto)):
+                reachable = False
+        return result
+
+
+class RemoveUnusedLabels(BlockPass):
+    def prepare(self, function):
+        self.targets = {
+            statement.label
+            for block in blocks(function.body)
+            for statement in block.statements
+            if isinstance(statement, Goto)
+        }
+
+    def rewrite(self, statements):
+        return [statement for statement in statements if not isinstance(statement, Label) or statement in self.targets]
+
+
+# emptying blocks comes before removing empty `else`
+DEFAULT_PASSES = [
+    fold_constants,
+    RemoveUnreachable(),
+    RemoveSelfAssignment(),
+    RemoveUnusedLabels(),
+    RemoveEmptyElse(),
+]
+
+
+def run_passes(item, passes=DEFAULT_PASSES):
+    functions = item.functions if isinstance(item, SourceCode) else [item]
+    for function in functions:
+        for run_pass in passes:
+            run_pass(function)
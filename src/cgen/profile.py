@@ -0,0 +1,154 @@
+# generated code profiling, enabled with `SourceCode.profile = "clock"` (nanoseconds from
+# clock_gettime) or "rdtsc" (x86 time stamp counter)
+#
+# every function counts its calls and inclusive time into `cgen_profile_table`, with each
+# `return` rewritten to store the result and jump to the exit of the function, where it is
+# counted; `cgen_profile_dump()` prints the table to stderr and runs at exit, and
+# `parse_profile` maps its output back to the functions
+import cgen  # partially initialized here, the classes are looked up on use
+
+MODES = ("clock", "rdtsc")
+RESULT = "cgen_profile_result"
+EXIT = "cgen_profile_exit"
+START = "cgen_profile_start"
+
+PRELUDE = """\
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+{timer_include}
+struct cgen_profile_entry {{
+  const char *name;
+  uint64_t calls;
+  uint64_t ticks;
+}};
+struct cgen_profile_entry cgen_profile_table[{count}] = {{
+{entries}
+}};
+static inline uint64_t cgen_profile_now(void) {{
+{timer}
+}}
+void cgen_profile_dump(void) {{
+  fprintf(stderr, "cgen_profile {unit}\\n");
+  for (size_t i = 0; i < {count}; i += 1) {{
+    fprintf(stderr, "cgen_profile %s %llu %llu\\n", cgen_profile_table[i].name,
+            (unsigned long long) cgen_profile_table[i].calls, (unsigned long long) cgen_profile_table[i].ticks);
+  }}
+}}
+__attribute__((constructor)) static void cgen_profile_register(void) {{
+  atexit(cgen_profile_dump);
+}}
+"""
+
+TIMERS = {
+    "clock": (
+        "#include <time.h>",
+        "  struct timespec t;\n"
+        "  clock_gettime(CLOCK_MONOTONIC, &t);\n"
+        "  return (uint64_t) t.tv_sec * 1000000000u + (uint64_t) t.tv_nsec;",
+        "ns",
+    ),
+    "rdtsc": ("#include <x86intrin.h>", "  return __rdtsc();", "cycles"),
+}
+
+
+def write_profiled_return(inner, writer):
+    result, exit_label, _ = writer.return_exit
+    writer.return_exit = result, exit_label, True
+    if result is None:  # `return f();` in a `void` function
+        inner.write(writer)
+    else:
+        writer.write(f"{result} = ")
+        inner.write(writer)
+    writer.write(f"; goto {exit_label};")
+
+
+class ProfiledBody:
+    def __init__(self, function, index):
+        self.function = function
+        self.index = index
+
+    def write(self, writer):
+        returns = self.function.return_type is not cgen.UNIT
+        with writer.braces():
+            line_writer = writer.lines()
+            next(line_writer).write(f"uint64_t {START} = cgen_profile_now();")
+            if returns:
+                self.function.return_type.write_declaration(RESULT, next(line_writer))
+                writer.write(";")
+            writer.return_exit = (RESULT if returns else None, EXIT, False)
+            try:
+                self.function.body.write(next(line_writer))
+                _, _, jumped = writer.return_exit
+            finally:
+                writer.return_exit = None
+            if jumped:  # an unused label is a warning
+                next(line_writer).write(f"{EXIT}:")
+            next(line_writer).write(f"cgen_profile_table[{self.index}].calls += 1;")
+            next(line_writer).write(f"cgen_profile_table[{self.index}].ticks += cgen_profile_now() - {START};")
+            if returns:
+                next(line_writer).write(f"return {RESULT};")
+
+
+# `functions` are the ones of `source` as emitted, see `SourceCode.prepare`; with `jobs`, the
+# definitions are rendered in parallel as in `SourceCode.write`
+def write_profiled(source, functions, writer, *, jobs=None):
+    assert source.profile in MODES, f"unknown profile mode {source.profile}"
+    timer_include, timer, unit = TIMERS[source.profile]
+    for item in source.includes:
+        item.write(writer)
+    writer.write(
+        PRELUDE.format(
+            timer_include=timer_include,
+            count=max(len(functions), 1),
+            entries="\n".join(f'  {{"{cgen.generate(item)}", 0, 0}},' for item in functions),
+            timer=timer,
+            unit=unit,
+        )
+    )
+    line_writer = writer.lines()
+    for item in source.structs:
+        next(line_writer).write(item.definition())
+    for item in functions:
+        next(line_writer).write(item.forward_declaration())
+    rendered = {}
+    if jobs:
+        indices = [index for index, item in enumerate(functions) if not item.lazy]
+        items = [(functions[index], index) for index in indices]
+        rendered = dict(zip(indices, cgen.parallel.render_in_parallel(items, jobs), strict=True))
+    for index, item in enumerate(functions):
+        if index in rendered:
+            next(line_writer).write(rendered[index])
+        else:
+            item.write_definition(next(line_writer), ProfiledBody(item, index))
+
+
+class ProfileEntry:
+    def __init__(self, function, calls, ticks):
+        self.function = function
+        self.calls = calls
+        self.ticks = ticks
+
+    @property
+    def name(self):
+        return self.function.name
+
+    @property
+    def type_arguments(self):
+        return self.function.type_arguments
+
+
+# the entries dumped by a profiled program, from the text of its stderr, hottest first; `unit`
+# is "ns" or "cycles"
+def parse_profile(text, source):
+    functions = {cgen.generate(function): function for function in source.functions}
+    unit = None
+    entries = []
+    for line in text.splitlines():
+        match line.split():
+            case ["cgen_profile", found_unit]:
+                unit = found_unit
+            case ["cgen_profile", name, calls, ticks] if calls.isdigit():
+                entries.append(ProfileEntry(functions[name], int(calls), int(ticks)))
+    entries.sort(key=lambda entry: -entry.ticks)
+    return unit, entries
@@ -0,0 +1,81 @@
+# tree shaking: drop the functions and structs of a `SourceCode` that the root functions do not
+# reach through calls (or any other use of a function), variable and expression types, and struct
+# field types; vector typedefs are pruned along with structs, includes are always kept
+from cgen import Array, Function, FunctionType, Pointer, Qualified, SourceCode, Struct, VectorType
+from cgen.checking import children
+from cgen.writer import generate
+
+
+class PruneReport:
+    def __init__(self, functions, structs):
+        self.functions = functions  # names of the removed functions
+        self.structs = structs  # names of the removed structs
+
+    def summary(self):
+        lines = [f"pruned {len(self.functions)} functions and {len(self.structs)} structs"]
+        lines += [f"  {name}" for name in self.functions + self.structs]
+        return "\n".join(lines)
+
+
+# `roots` are functions or their generated names, e.g. exported symbols
+def prune(source, roots=("main",)):
+    assert isinstance(source, SourceCode)
+    named = {generate(function): function for function in source.functions}
+    pending = []
+    for root in roots:
+        if isinstance(root, Function):
+            pending.append(root)
+        else:
+            assert root in named, f"no function {root}"
+            pending.append(named[root])
+    functions = set()
+    types = []
+    while pending:
+        function = pending.pop()
+        if function in functions:
+            continue
+        if function.lazy:
+            raise ValueError(f"{function.name} has streamed statements, call `materialize` first")
+        functions.add(function)
+        types += [function.return_type, *(parameter.ty for parameter in function.parameters)]
+        nodes = [function.body]
+        while nodes:
+            node = nodes.pop()
+            match node:
+                case Function():
+                    pending.append(node)
+                    continue
+                # as in `sizeof`
+                case Struct() | Pointer() | Qualified() | Array() | FunctionType() | VectorType():
+                    types.append(node)
+            ty = getattr(node, "ty", None)
+            if ty is not None:
+                types.append(ty)
+            nodes += children(node)
+    structs = reached_structs(types)
+    report = PruneReport(
+        [generate(function) for function in source.functions if function not in functions],
+        [generate(struct) for struct in source.structs if struct not in structs],
+    )
+    source.functions = [function for function in source.functions if function in functions]
+    source.structs = [struct for struct in source.structs if struct in structs]
+    for name in report.functions + report.structs:
+        del source.names[name]
+    return report
+
+
+def reached_structs(types):
+    structs = set()
+    while types:
+        ty = types.pop()
+        match ty:
+            case Pointer() | Qualified() | Array():
+                types.append(ty.inner)
+            case FunctionType():
+                types += [ty.return_type, *ty.parameter_types]
+            case Struct() if ty not in structs:
+                structs.add(ty)
+                types += [field_type for field_type, _ in ty.fields]
+            case VectorType():
+                structs.add(ty)
+    return structs
@@ -0,0 +1,376 @@
+# regular expression to C: pattern -> NFA -> minimized DFA -> goto based state machine
+#
+# supported subset (bytes semantic, ASCII patterns): literals, `.`, `[...]` and `[^...]` classes,
+# `\d \w \s \D \W \S` and escaped punctuation, groups `(...)` and `(?:...)`, `|`, and the greedy
+# repetitions `* + ? {m} {m,} {m,n}`
+#
+# the generated functions answer the same question as `re.match(p, s) is not None` (anchored) or
+# `re.search(p, s) is not None` (unanchored), so they stop at the first accepting state
+from cgen import INT, U8, USIZE, Function, Int
+
+DEAD = -1
+
+ANY = frozenset(range(256))
+DIGIT = frozenset(range(ord("0"), ord("9") + 1))
+WORD = DIGIT | frozenset(range(ord("a"), ord("z") + 1)) | frozenset(range(ord("A"), ord("Z") + 1)) | {ord("_")}
+SPACE = frozenset(b" \t\n\r\f\v")
+CLASS_ESCAPES = {"d": DIGIT, "w": WORD, "s": SPACE, "D": ANY - DIGIT, "W": ANY - WORD, "S": ANY - SPACE}
+CHAR_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "0": "\0"}
+
+
+# syntax tree is made of tuples: ("set", bytes), ("cat", left, right), ("alt", left, right),
+# ("star", inner) and ("empty",)
+class Parser:
+    def __init__(self, pattern):
+        if not pattern.isascii():
+            raise ValueError("only ASCII patterns are supported")
+        self.pattern = pattern
+        self.position = 0
+
+    def peek(self):
+        return self.pattern[self.position] if self.position < len(self.pattern) else None
+
+    def take(self):
+        c = self.peek()
+        if c is None:
+            raise ValueError(f"unexpected end of pattern {self.pattern!r}")
+        self.position += 1
+        return c
+
+    def error(self, message):
+        return ValueError(f"{message} at {self.position} in {self.pattern!r}")
+
+    def parse(self):
+        node = self.alternation()
+        if self.peek() is not None:
+            raise self.error(f"unexpected {self.peek()!r}")
+        return node
+
+    def alternation(self):
+        node = self.concatenation()
+        while self.peek() == "|":
+            self.take()
+            node = ("alt", node, self.concatenation())
+        return node
+
+    def concatenation(self):
+        node = ("empty",)
+        while self.peek() not in (None, "|", ")"):
+            node = ("cat", node, self.repetition())
+        return node
+
+    def repetition(self):
+        node = self.atom()
+        while self.peek() in ("*", "+", "?", "{"):
+            c = self.take()
+            if c == "*":
+                node = ("star", node)
+            elif c == "+":
+                node = ("cat", node, ("star", node))
+            elif c == "?":
+                node = ("alt", node, ("empty",))
+            else:
+                node = self.counted(node)
+            if self.peek() in ("?", "+"):
+                raise self.error("lazy and possessive repetitions are not supported")
+        return node
+
+    def counted(self, node):
+        text = ""
+        while self.peek() != "}":
+            text += self.take()
+        self.take()
+        low, comma, high = text.partition(",")
+        if not low.isdigit() or (high and not high.isdigit()):
+            raise self.error(f"bad repetition {{{text}}}")
+        low = int(low)
+        result = ("empty",)
+        for _ in range(low):
+            result = ("cat", result, node)
+        if not comma:
+            return result
+        if not high:
+            return ("cat", result, ("star", node))
+        optional = ("alt", node, ("empty",))
+        for _ in range(int(high) - low):
+            result = ("cat", result, optional)
+        return result
+
+    def atom(self):
+        c = self.take()
+        if c == "(":
+            if self.pattern.startswith("?:", self.position):
+                self.position += 2
+            elif self.peek() == "?":
+                raise self.error("group extensions are not supported")
+            node = self.alternation()
+            if self.take() != ")":
+                raise self.error("missing )")
+            return node
+        if c == "[":
+            return ("set", self.bracket())
+        if c == ".":
+            return ("set", ANY - {ord("\n")})
+        if c == "\\":
+            return ("set", self.escape())
+        if c in "*+?{":
+            raise self.error(f"nothing to repeat for {c!r}")
+        if c in "^$":
+            raise self.error("anchors are not supported")
+        return ("set", frozenset([ord(c)]))
+
+    def escape(self):
+        c = self.take()
+        if c in CLASS_ESCAPES:
+            return CLASS_ESCAPES[c]
+        if c in CHAR_ESCAPES:
+            return frozenset([ord(CHAR_ESCAPES[c])])
+        if c.isalnum():
+            raise self.error(f"unsupported escape \\{c}")
+        return frozenset([ord(c)])
+
+    def bracket(self):
+        negate = self.peek() == "^"
+        if negate:
+            self.take()
+        members = set()
+        first = True
+        while first or self.peek() != "]":
+            first = False
+            c = self.take()
+            if c == "\\":
+                escaped = self.escape()
+                if len(escaped) > 1:
+                    members |= escaped
+                    continue
+                (low,) = escaped
+            else:
+                low = ord(c)
+            if self.peek() == "-" and self.pattern[self.position + 1 : self.position + 2] not in ("]", ""):
+                self.take()
+                c = self.take()
+                high = ord(c) if c != "\\" else min(self.escape())
+                if high < low:
+                    raise self.error("bad character range")
+                members |= set(range(low, high + 1))
+            else:
+                members.add(low)
+        self.take()
+        return ANY - members if negate else frozenset(members)
+
+
+def parse_regex(pattern):
+    return Parser(pattern).parse()
+
+
+# Thompson construction, state `i` has `epsilon[i]` and `edges[i]` of (byte set, target)
+class Nfa:
+    def __init__(self, tree):
+        self.epsilon = []
+        self.edges = []
+        self.start, self.accept = self.build(tree)
+
+    def state(self):
+        self.epsilon.append([])
+        self.edges.append([])
+        return len(self.epsilon) - 1
+
+    def build(self, tree):
+        start, end = self.state(), self.state()
+        match tree:
+            case ("empty",):
+                self.epsilon[start].append(end)
+            case ("set", members):
+                self.edges[start].append((members, end))
+            case ("cat", left, right):
+                left_start, left_end = self.build(left)
+                right_start, right_end = self.build(right)
+                self.epsilon[start].append(left_start)
+                self.epsilon[left_end].append(right_start)
+                self.epsilon[right_end].append(end)
+            case ("alt", left, right):
+                for inner_start, inner_end in (self.build(left), self.build(right)):
+                    self.epsilon[start].append(inner_start)
+                    self.epsilon[inner_end].append(end)
+            case ("star", inner):
+                inner_start, inner_end = self.build(inner)
+                self.epsilon[start] += [inner_start, end]
+                self.epsilon[inner_end] += [inner_start, end]
+        return start, end
+
+    def closure(self, states):
+        result = set(states)
+        pending = list(states)
+        while pending:
+            for target in self.epsilon[pending.pop()]:
+                if target not in result:
+                    result.add(target)
+                    pending.append(target)
+        return frozenset(result)
+
+
+class Dfa:
+    # `transitions[state][byte]` is the next state or `DEAD`; accepting states are final and have
+    # no transitions, since matching stops as soon as one is reached
+    def __init__(self, transitions, accepting, start=0):
+        self.transitions = transitions
+        self.accepting = accepting
+        self.start = start
+
+    @classmethod
+    def from_pattern(cls, pattern, *, search=False):
+        return cls.from_nfa(Nfa(parse_regex(pattern)), search=search).minimize()
+
+    @classmethod
+    def from_nfa(cls, nfa, *, search=False):
+        # bytes that no edge tells apart share a class, so each subset is moved once per class
+        sets = sorted({members for edges in nfa.edges for members, _ in edges}, key=sorted)
+        classes = {}
+        for byte in range(256):
+            classes.setdefault(tuple(byte in members for members in sets), []).append(byte)
+        initial = nfa.closure([nfa.start])
+        index = {initial: 0}
+        subsets = [initial]
+        transitions = []
+        accepting = set()
+        for subset in subsets:  # grows while iterating
+            row = [DEAD] * 256
+            transitions.append(row)
+            if nfa.accept in subset:
+                accepting.add(index[subset])
+                continue
+            for members in classes.values():
+                byte = members[0]
+                targets = [target for state in subset for edge, target in nfa.edges[state] if byte in edge]
+                if search:
+                    # a match may start at every position
+                    targets.append(nfa.start)
+                if not targets:
+                    continue
+                target = nfa.closure(targets)
+                if target not in index:
+                    index[target] = len(subsets)
+                    subsets.append(target)
+                for byte in members:
+                    row[byte] = index[target]
+        return cls(transitions, accepting)
+
+    def minimize(self):
+        # Moore partition refinement, starting from accepting / not accepting
+        group = [int(state in self.accepting) for state in range(len(self.transitions))]
+        while True:
+            signatures = {}
+            refined = []
+            for state, row in enumerate(self.transitions):
+                signature = (group[state], *(DEAD if target == DEAD else group[target] for target in row))
+                refined.append(signatures.setdefault(signature, len(signatures)))
+            if len(signatures) == len(set(group)):
+                break
+            group = refined
+        # renumber in discovery order from the start state, so output is stable and starts with it
+        order = {}
+        pending = [group[self.start]]
+        representative = {}
+        for state in range(len(self.transitions)):
+            representative.setdefault(group[state], state)
+        while pending:
+            current = pending.pop(0)
+            if current in order:
+                continue
+            order[current] = len(order)
+            pending += [group[target] for target in self.transitions[representative[current]] if target != DEAD]
+        transitions = [None] * len(order)
+        accepting = set()
+        for current, new in order.items():
+            state = representative[current]
+            transitions[new] = [DEAD if target == DEAD else order[group[target]] for target in self.transitions[state]]
+            if state in self.accepting:
+                accepting.add(new)
+        return Dfa(transitions, accepting)
+
+    def matches(self, data):
+        state = self.start
+        for byte in data:
+            if state in self.accepting:
+                return True
+            state = self.transitions[state][byte]
+            if state == DEAD:
+                return False
+        return state in self.accepting
+
+
+def byte_ranges(members):
+    ranges = []
+    for byte in sorted(members):
+        if ranges and ranges[-1][1] == byte - 1:
+            ranges[-1][1] = byte
+        else:
+            ranges.append([byte, byte])
+    return ranges
+
+
+def range_condition(c, low, high):
+    if low == high:
+        return (c, "==", Int(low, U8))
+    if low == 0:
+        return (c, "<=", Int(high, U8))
+    if high == 255:  # noqa: PLR2004
+        return (c, ">=", Int(low, U8))
+    return ((c, ">=", Int(low, U8)), "&&", (c, "<=", Int(high, U8)))
+
+
+# int name(uint8_t *s, size_t n), returns 1 if the pattern matches (at start, or anywhere with
+# `search`) and 0 otherwise
+def matcher(pattern, name=None, *, search=False):
+    dfa = Dfa.from_pattern(pattern, search=search)
+    f = Function(name or ("regex_search" if search else "regex_match"))
+    f.return_type = INT
+    s = f.add_parameter(("*", U8), "s")
+    n = f.add_parameter(USIZE, "n")
+    if dfa.start in dfa.accepting:
+        f.ret(Int(1, INT))
+        return f
+    i = f.declare(USIZE, "i")
+    c = f.declare(U8, "c")
+    f.add(i, "=", Int(0, USIZE))
+    gotos = {}  # target state -> goto statements to resolve once its label is placed
+    labels = {}
+
+    def jump(target):
+        if target in dfa.accepting:
+            f.ret(Int(1, INT))
+        else:
+            gotos.setdefault(target, []).append(f.goto())
+
+    for state, row in enumerate(dfa.transitions):
+        if state in dfa.accepting:
+            continue
+        labels[state] = f.label(f"s{state}")
+        with f.when(i, "==", n):
+            f.ret(Int(0, INT))
+        f.add(c, "=", (s, "[]", i))
+        f.add(i, "=", (i, "+", Int(1, USIZE)))
+        targets = {}
+        for byte, target in enumerate(row):
+            if target != DEAD:
+                targets.setdefault(target, []).append(byte)
+        # the widest target goes last, unconditionally if no byte leads to the dead state
+        ordered = sorted(targets.items(), key=lambda item: (len(item[1]), item[0]))
+        fallback = None
+        if DEAD not in row:
+            fallback, _ = ordered.pop()
+        for target, members in ordered:
+            condition = None
+            for low, high in byte_ranges(members):
+                term = range_condition(c, low, high)
+                condition = term if condition is None else (condition, "||", term)
+            with f.when(*condition):
+                jump(target)
+        if fallback is None:
+            f.ret(Int(0, INT))
+        else:
+            jump(fallback)
+    for target, statements in gotos.items():
+        for statement in statements:
+            statement.label = labels[target]
+    return f
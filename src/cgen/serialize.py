@@ -0,0 +1,449 @@
+# versioned binary format of a `SourceCode` graph, to cache the result of slow generators
+#   data = dumps(source)
+#   source = loads(data)  # generates the same text as the original
+#
+# layout, all integers are unsigned 32 bit little endian:
+#   b"CGEN", version, number of strings, number of words, byte length of every string, the
+#   UTF-8 strings, then the records as words
+# every node is one record: its tag followed by fields, where references to other nodes are
+# record numbers starting at 1 (0 is None) and strings are indices into the string table; children
+# come before their parents, and nodes shared in the graph (variables, labels, interned types and
+# `Int`s, ...) are written once
+# `Struct` and `Function` records only carry the name and signature, and their fields and body
+# follow in separate records, so recursive structs and functions can refer to themselves
+#
+# passes of the source and text caches are not saved, lazy functions are not supported
+import sys
+from array import array
+from enum import IntEnum
+
+from cgen import (
+    Array,
+    Assign,
+    Block,
+    Call,
+    Cast,
+    Declare,
+    Function,
+    FunctionType,
+    GetAttr,
+    GetItem,
+    Goto,
+    IfElse,
+    Include,
+    Int,
+    Label,
+    Null,
+    Op,
+    Pointer,
+    Primitive,
+    Qualified,
+    Return,
+    Run,
+    SetAttr,
+    SetItem,
+    SourceCode,
+    String,
+    Struct,
+    Switch,
+    Variable,
+    VectorType,
+    While,
+)
+from cgen.checking import OFF, checks
+
+MAGIC = b"CGEN"
+VERSION = 4  # 2: pointer qualifiers, function specifiers and branch hints, 3: vector types, 4: qualified types
+
+
+class Tag(IntEnum):
+    PRIMITIVE = 0
+    POINTER = 1
+    ARRAY = 2
+    FUNCTION_TYPE = 3
+    STRUCT = 4
+    STRUCT_FIELDS = 5
+    FUNCTION = 6
+    FUNCTION_BODY = 7
+    VARIABLE = 8
+    INT = 9
+    STRING = 10
+    NULL = 11
+    BLOCK = 12
+    DECLARE = 13
+    ASSIGN = 14
+    RETURN = 15
+    RUN = 16
+    IF_ELSE = 17
+    WHILE = 18
+    SWITCH = 19
+    LABEL = 20
+    GOTO = 21
+    CALL = 22
+    OP = 23
+    GET_ITEM = 24
+    SET_ITEM = 25
+    GET_ATTR = 26
+    SET_ATTR = 27
+    CAST = 28
+    INCLUDE = 29
+    SOURCE_CODE = 30
+    VECTOR_TYPE = 31
+    QUALIFIED = 32
+
+
+def words_from_bytes(data):
+    words = array("I")
+    words.frombytes(data)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+
+def words_to_bytes(words):
+    if sys.byteorder == "big":
+        words = array("I", words)
+        words.byteswap()
+    return words.tobytes()
+
+
+class Encoder:
+    def __init__(self):
+        self.words = array("I")
+        self.strings = {}  # string -> index
+        self.indices = {}  # id(node) -> record number
+        self.count = 0
+        self.bodies = []  # functions with the body still to write
+
+    def string(self, value):
+        return self.strings.setdefault(value, len(self.strings))
+
+    def ref(self, node):
+        if node is None:
+            return 0
+        return self.indices.get(id(node)) or self.encode(node)
+
+    def refs(self, nodes):
+        return [len(nodes), *(self.ref(node) for node in nodes)]
+
+    def named_refs(self, pairs):
+        return [len(pairs), *(word for name, node in pairs for word in (self.string(name), self.ref(node)))]
+
+    def emit(self, tag, fields, node=None):
+        self.words.append(tag)
+        self.words.extend(fields)
+        if node is None:
+            return 0
+        self.count += 1
+        self.indices[id(node)] = self.count
+        return self.count
+
+    def encode(self, node):
+        match node:
+            case Primitive():
+                return self.emit(Tag.PRIMITIVE, [self.string(node.name)], node)
+            case Pointer():
+                return self.emit(Tag.POINTER, [self.ref(node.inner), *self.strings_of(node.qualifiers)], node)
+            case Qualified():
+                return self.emit(Tag.QUALIFIED, [self.ref(node.inner), *self.strings_of(node.qualifiers)], node)
+            case Array():
+                assert isinstance(node.length, int)
+                return self.emit(Tag.ARRAY, [self.ref(node.inner), node.length], node)
+            case FunctionType():
+                fields = [self.ref(node.return_type), *self.refs(node.parameter_types)]
+                return self.emit(Tag.FUNCTION_TYPE, fields, node)
+            case VectorType():
+                return self.emit(Tag.VECTOR_TYPE, [self.ref(node.inner), node.lanes], node)
+            case Struct():
+                type_arguments = self.named_refs(sorted(node.type_arguments.items()))
+                index = self.emit(Tag.STRUCT, [self.string(node.name), *type_arguments], node)
+                fields = self.named_refs([(identifier, ty) for ty, identifier in node.fields])
+                self.emit(Tag.STRUCT_FIELDS, [index, *fields])
+                return index
+            case Function():
+                if node.lazy:
+                    raise ValueError(f"{node.name} has streamed statements, call `materialize` first")
+                index = self.emit(
+                    Tag.FUNCTION,
+                    [
+                        self.string(node.name),
+                        *self.named_refs(sorted(node.type_arguments.items())),
+                        self.ref(node.return_type),
+                        *self.refs(node.parameters),
+                        *self.counters(node.identifiers),
+                        *self.counters(node.labels),
+                        self.string(node.storage or ""),
+                        int(node.inline),
+                        *self.strings_of(node.attributes),
+                    ],
+                    node,
+                )
+                self.bodies.append(node)
+                return index
+            case Variable():
+                return self.emit(Tag.VARIABLE, [self.ref(node.ty), self.string(node.name)], node)
+            case Int():
+                return self.emit(Tag.INT, [self.string(str(node.value)), self.ref(node.ty)], node)
+            case String():
+                return self.emit(Tag.STRING, [self.string(node.value)], node)
+            case Null():
+                return self.emit(Tag.NULL, [self.ref(node.inner_type)], node)
+            case Block():
+                return self.emit(Tag.BLOCK, self.refs(node.statements), node)
+            case Declare():
+                return self.emit(Tag.DECLARE, [self.ref(node.variable)], node)
+            case Assign():
+                return self.emit(Tag.ASSIGN, [self.ref(node.place), self.ref(node.source)], node)
+            case Return():
+                return self.emit(Tag.RETURN, [self.ref(node.inner)], node)
+            case Run():
+                return self.emit(Tag.RUN, [self.ref(node.inner)], node)
+            case IfElse():
+                fields = [self.ref(node.condition), self.ref(node.positive), self.ref(node.negative)]
+                fields.append(0 if node.expect is None else 1 + int(node.expect))
+                return self.emit(Tag.IF_ELSE, fields, node)
+            case While():
+                return self.emit(Tag.WHILE, [self.ref(node.condition), self.ref(node.body)], node)
+            case Switch():
+                cases = [word for value, block in node.cases for word in (self.ref(value), self.ref(block))]
+                return self.emit(Tag.SWITCH, [self.ref(node.condition), len(node.cases), *cases], node)
+            case Label():
+                return self.emit(Tag.LABEL, [self.string(node.name)], node)
+            case Goto():
+                return self.emit(Tag.GOTO, [self.ref(node.label)], node)
+            case Call():
+                return self.emit(Tag.CALL, [self.ref(node.callee), *self.refs(node.arguments)], node)
+            case Op():
+                return self.emit(Tag.OP, [self.string(node.op), self.ref(node.left), self.ref(node.right)], node)
+            case GetItem():
+                return self.emit(Tag.GET_ITEM, [self.ref(node.array), self.ref(node.position)], node)
+            case SetItem():
+                fields = [self.ref(node.array), self.ref(node.position), self.ref(node.source)]
+                return self.emit(Tag.SET_ITEM, fields, node)
+            case GetAttr():
+                return self.emit(Tag.GET_ATTR, [self.ref(node.struct), self.string(node.attr)], node)
+            case SetAttr():
+                fields = [self.ref(node.struct), self.string(node.attr), self.ref(node.source)]
+                return self.emit(Tag.SET_ATTR, fields, node)
+            case Cast():
+                return self.emit(Tag.CAST, [self.ref(node.ty), self.ref(node.inner)], node)
+            case Include():
+                return self.emit(Tag.INCLUDE, [self.string(node.name), int(node.system)], node)
+            case SourceCode():
+                fields = [*self.refs(list(node.includes)), *self.refs(node.structs), *self.refs(node.functions)]
+                self.write_bodies()
+                return self.emit(Tag.SOURCE_CODE, fields, node)
+        raise TypeError(f"cannot serialize {type(node).__name__}")
+
+    def counters(self, counters):
+        return [len(counters), *(word for name, count in counters.items() for word in (self.string(name), count))]
+
+    def strings_of(self, values):
+        return [len(values), *map(self.string, values)]
+
+    def write_bodies(self):
+        while self.bodies:  # grows while writing the bodies
+            function = self.bodies.pop(0)
+            self.emit(Tag.FUNCTION_BODY, [self.indices[id(function)], self.ref(function.body)])
+
+    def getvalue(self):
+        strings = [string.encode() for string in self.strings]
+        header = array("I", [VERSION, len(strings), len(self.words), *map(len, strings)])
+        return MAGIC + words_to_bytes(header) + b"".join(strings) + words_to_bytes(self.words)
+
+
+def dumps(source):
+    encoder = Encoder()
+    encoder.encode(source)
+    return encoder.getvalue()
+
+
+def dump(source, fp):
+    fp.write(dumps(source))
+
+
+class Decoder:
+    def __init__(self, data):
+        if data[:4] != MAGIC:
+            raise ValueError("not a serialized cgen source")
+        (version,) = words_from_bytes(data[4:8])
+        if version != VERSION:
+            raise ValueError(f"serialized with format version {version}, expected {VERSION}")
+        string_count, word_count = words_from_bytes(data[8:16])
+        offset = 16 + 4 * string_count
+        self.strings = []
+        for length in words_from_bytes(data[16:offset]):
+            self.strings.append(data[offset : offset + length].decode())
+            offset += length
+        self.words = words_from_bytes(data[offset : offset + 4 * word_count])
+        # readers take the fields from the same iterator as the tags
+        self.tags = iter(self.words)
+        self.word = self.tags.__next__
+        self.nodes = [None]  # record number -> node
+        # indexed by tag, a table instead of matching on the tag since this is the hot loop
+        self.readers = [getattr(self, "read_" + tag.name.lower()) for tag in Tag]
+
+    def string(self):
+        return self.strings[self.word()]
+
+    def ref(self):
+        return self.nodes[self.word()]
+
+    def refs(self):
+        word, nodes = self.word, self.nodes
+        return [nodes[word()] for _ in range(word())]
+
+    def named_refs(self):
+        return [(self.string(), self.ref()) for _ in range(self.word())]
+
+    def counters(self):
+        return {self.string(): self.word() for _ in range(self.word())}
+
+    def strings_of(self):
+        return tuple(self.string() for _ in range(self.word()))
+
+    def decode(self):
+        append, readers = self.nodes.append, self.readers
+        with checks(OFF):  # the graph was checked (or not) when it was built
+            for tag in self.tags:
+                node = readers[tag]()
+                if node is not None:  # records completing an earlier node give None
+                    append(node)
+        return self.nodes[-1]
+
+    def read_primitive(self):
+        return Primitive(self.string())
+
+    def read_pointer(self):
+        inner = self.ref()
+        return Pointer(inner, self.strings_of())
+
+    def read_array(self):
+        return Array(self.ref(), self.word())
+
+    def read_function_type(self):
+        return FunctionType(self.ref(), self.refs())
+
+    def read_vector_type(self):
+        return VectorType(self.ref(), self.word())
+
+    def read_qualified(self):
+        inner = self.ref()
+        return Qualified(inner, self.strings_of())
+
+    def read_struct(self):
+        return Struct(self.string(), **dict(self.named_refs()))
+
+    def read_struct_fields(self):
+        struct = self.ref()
+        for identifier, ty in self.named_refs():
+            struct.add_field(ty, identifier)
+
+    def read_function(self):
+        function = Function(self.string(), **dict(self.named_refs()))
+        function.return_type = self.ref()
+        function.parameters = self.refs()
+        function.identifiers = self.counters()
+        function.labels = self.counters()
+        storage, inline = self.string() or None, bool(self.word())
+        function.specify(storage=storage, inline=inline, attributes=self.strings_of())
+        return function
+
+    def read_function_body(self):
+        function = self.ref()
+        function.body = function.active_block = self.ref()
+
+    def read_variable(self):
+        ty = self.ref()
+        return Variable(ty, self.string())
+
+    def read_int(self):
+        value = int(self.string())
+        return Int(value, self.ref())
+
+    def read_string(self):
+        return String(self.string())
+
+    def read_null(self):
+        return Null(self.ref())
+
+    def read_block(self):
+        block = Block()
+        block.statements = self.refs()
+        return block
+
+    def read_declare(self):
+        return Declare(self.ref())
+
+    def read_assign(self):
+        return Assign(self.ref(), self.ref())
+
+    def read_return(self):
+        return Return(self.ref())
+
+    def read_run(self):
+        return Run(self.ref())
+
+    def read_if_else(self):
+        statement = IfElse(self.ref())
+        statement.positive = self.ref()
+        statement.negative = self.ref()
+        expect = self.word()
+        statement.expect = None if expect == 0 else bool(expect - 1)
+        return statement
+
+    def read_while(self):
+        statement = While(self.ref())
+        statement.body = self.ref()
+        return statement
+
+    def read_switch(self):
+        statement = Switch(self.ref())
+        statement.cases = [(self.ref(), self.ref()) for _ in range(self.word())]
+        return statement
+
+    def read_label(self):
+        return Label(self.string())
+
+    def read_goto(self):
+        return Goto(self.ref())
+
+    def read_call(self):
+        callee = self.ref()
+        return Call(callee, self.refs())
+
+    def read_op(self):
+        return Op(self.string(), self.ref(), self.ref())
+
+    def read_get_item(self):
+        return GetItem(self.ref(), self.ref())
+
+    def read_set_item(self):
+        return SetItem(self.ref(), self.ref(), self.ref())
+
+    def read_get_attr(self):
+        return GetAttr(self.ref(), self.string())
+
+    def read_set_attr(self):
+        return SetAttr(self.ref(), self.string(), self.ref())
+
+    def read_cast(self):
+        return Cast(self.ref(), self.ref())
+
+    def read_include(self):
+        name = self.string()
+        return Include(name, system=bool(self.word()))
+
+    def read_source_code(self):
+        source = SourceCode()
+        for item in self.refs() + self.refs() + self.refs():
+            source.add(item)
+        return source
+
+
+def loads(data):
+    return Decoder(data).decode()
+
+
+def load(fp):
+    return loads(fp.read())
@@ -0,0 +1,70 @@
+from cgen import (
+    USIZE,
+    Function,
+    FunctionType,
+    Include,
+    Interned,
+    Op,
+    Pointer,
+    Variable,
+    VectorType,
+    parse_type,
+)
+
+
+# loads, stores and broadcast of a `VectorType`, as static inline functions
+#   simd = Simd(I32, 8)
+#   f.assign(v, simd.load(a[i].addr()) + simd.broadcast(x))
+#   f.run(simd.store(a[i].addr(), v))
+# loads and stores go through `memcpy`, so the pointer needs no vector alignment and the access
+# is compiled to one unaligned vector move; instantiations are cached like `Vec`
+class Simd(metaclass=Interned):
+    def __init__(self, inner_type, lanes):
+        self.ty = VectorType(parse_type(inner_type), lanes)
+        self.load = self.gen_load()
+        self.store = self.gen_store()
+        self.broadcast = self.gen_broadcast()
+
+    @staticmethod
+    def intern_key(inner_type, lanes):
+        return parse_type(inner_type), lanes
+
+    def memcpy(self, target_type, source_type):
+        return Variable(FunctionType(target_type, [target_type, source_type, USIZE]), "memcpy")
+
+    def gen_load(self):
+        f = Function("simd_load", T=self.ty)
+        f.specify(storage="static", inline=True)
+        f.return_type = self.ty
+        p = f.add_parameter(Pointer(self.ty.inner), "p")
+        v = f.declare(self.ty, "v")
+        f.run(self.memcpy(Pointer(self.ty), Pointer(self.ty.inner))(v.addr(), p, Op.unary("sizeof", self.ty)))
+        f.ret(v)
+        return f
+
+    def gen_store(self):
+        f = Function("simd_store", T=self.ty)
+        f.specify(storage="static", inline=True)
+        p = f.add_parameter(Pointer(self.ty.inner), "p")
+        v = f.add_parameter(self.ty, "v")
+        f.run(self.memcpy(Pointer(self.ty.inner), Pointer(self.ty))(p, v.addr(), Op.unary("sizeof", self.ty)))
+        return f
+
+    # every lane set to `x`, compiled to a single broadcast instruction
+    def gen_broadcast(self):
+        f = Function("simd_broadcast", T=self.ty)
+        f.specify(storage="static", inline=True)
+        f.return_type = self.ty
+        x = f.add_parameter(self.ty.inner, "x")
+        v = f.declare(self.ty, "v")
+        for lane in range(self.ty.lanes):
+            f.assign(v[lane], x)
+        f.ret(v)
+        return f
+
+    def items(self):
+        yield Include("string.h")
+        yield self.ty
+        yield self.load
+        yield self.store
+        yield self.broadcast
@@ -0,0 +1,134 @@
+# multiple file output, so the C compiler can run in parallel:
+#   NAME.h      includes, struct definitions, forward declarations and the definitions of static
+#               and plain inline functions, which every unit needs its own copy of, with an include
+#               guard; the first `.c` file redeclares the plain inline ones `extern`, which makes it
+#               provide their external definitions, as C99 asks for calls that are not inlined
+#   NAME_K.c    the other function definitions, partitioned by size over `units` files
+#   Makefile    builds the program NAME from them, with `make -jN`
+#   files.txt   the `.c` files, for other build systems
+# the partition only depends on the generated text, so unchanged sources give unchanged files
+import os
+import re
+from functools import partial
+
+from cgen.writer import Writer
+
+
+class ByteCounter:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+# size of the definition, lazy functions are written once to count it instead of being stored
+def definition_size(function):
+    if not function.lazy:
+        return len(function.definition())
+    counter = ByteCounter()
+    writer = Writer(counter)
+    function.write_definition(writer)
+    writer.flush()
+    return counter.size
+
+
+# longest processing time first: the largest function goes to the smallest unit so far, with ties
+# broken by position in the source and unit index; units keep the source order of functions
+def partition(functions, units):
+    sizes = [definition_size(function) for function in functions]
+    totals = [0] * units
+    assigned = [[] for _ in range(units)]
+    for index in sorted(range(len(functions)), key=lambda index: (-sizes[index], index)):
+        unit = min(range(units), key=lambda unit: (totals[unit], unit))
+        totals[unit] += sizes[index]
+        assigned[unit].append(index)
+    return [[functions[index] for index in sorted(indices)] for indices in assigned]
+
+
+def write_definition(item, writer):
+    if item.lazy:
+        item.write_definition(writer)
+    else:
+        writer.write(item.definition())
+    writer.line_break()
+
+
+def write_file(path, write):
+    with open(path, "w") as fp:
+        writer = Writer(fp)
+        write(writer)
+        writer.flush()
+
+
+def write_header(source, functions, writer, guard):
+    writer.write(f"#ifndef {guard}")
+    writer.line_break()
+    writer.write(f"#define {guard}")
+    writer.line_break()
+    for item in source.includes:
+        item.write(writer)
+    for item in source.structs:
+        writer.write(item.definition())
+        writer.line_break()
+    for item in functions:
+        writer.write(item.forward_declaration())
+        writer.line_break()
+    for item in functions:
+        if not item.exported:
+            write_definition(item, writer)
+    writer.write("#endif")
+    writer.line_break()
+
+
+def write_unit(header, functions, writer, provided=()):
+    writer.write(f'#include "{header}"')
+    writer.line_break()
+    for item in provided:
+        writer.write("extern " + item.forward_declaration())
+        writer.line_break()
+    for item in functions:
+        write_definition(item, writer)
+
+
+MAKEFILE = """\
+CC ?= cc
+CFLAGS ?= -O2
+OBJECTS = {objects}
+
+{name}: $(OBJECTS)
+\t$(CC) $(CFLAGS) -o $@ $(OBJECTS) $(LDLIBS)
+
+%.o: %.c {header}
+\t$(CC) $(CFLAGS) -c -o $@ $<
+
+clean:
+\trm -f {name} $(OBJECTS)
+
+.PHONY: clean
+"""
+
+
+# write `source` into `directory` as above, returns the paths of the written `.c` files
+def write_split(source, directory, *, units=4, name="main", jobs=None):
+    assert units >= 1
+    if source.profile:
+        raise ValueError("profile mode needs the single file output of `SourceCode.write`")
+    functions = source.prepare(jobs=jobs)
+    os.makedirs(directory, exist_ok=True)
+    header = f"{name}.h"
+    guard = re.sub(r"\W", "_", header).upper()
+    write_file(os.path.join(directory, header), partial(write_header, source, functions, guard=guard))
+    sources = []
+    external = [function for function in functions if function.exported]
+    inline = [function for function in functions if function.storage is None and function.inline]
+    for index, functions in enumerate(partition(external, units)):
+        sources.append(f"{name}_{index}.c")
+        provided = inline if index == 0 else ()
+        write_file(os.path.join(directory, sources[-1]), partial(write_unit, header, functions, provided=provided))
+    objects = " ".join(path.removesuffix(".c") + ".o" for path in sources)
+    with open(os.path.join(directory, "Makefile"), "w") as fp:
+        fp.write(MAKEFILE.format(name=name, header=header, objects=objects))
+    with open(os.path.join(directory, "files.txt"), "w") as fp:
+        fp.writelines(path + "\n" for path in sources)
+    return [os.path.join(directory, path) for path in sources]
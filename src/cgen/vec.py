@@ -5,22 +5,29 @@ from cgen import (
     Function,
     Include,
     Int,
+    Interned,
     Null,
     Pointer,
     Struct,
     Variable,
+    parse_type,
 )
 
 
-class Vec:
+# instantiations are cached by type argument, so every `Vec(I32)` is the same object
+class Vec(metaclass=Interned):
     def __init__(self, inner_type):
-        self.inner_type = inner_type
+        self.inner_type = parse_type(inner_type)
         self.struct = self.gen_struct()
         self.new = self.gen_new()
         self.drop = self.gen_drop()
         self.reserve = self.gen_reserve()
         self.push = self.gen_push()
 
+    @staticmethod
+    def intern_key(inner_type):
+        return parse_type(inner_type)
+
     def gen_struct(self):
         s = Struct("Vec", T=self.inner_type)
         s.add_field(Pointer(self.inner_type), "buf")
@@ -51,6 +58,8 @@ class Vec:
 
     def gen_reserve(self):
         f = Function("vec_reserve", T=self.inner_type)
+        # only reached when the buffer grows, kept out of line of the inlined push
+        f.specify(attributes=("cold", "noinline"))
         v = f.add_parameter(("*", self.struct), "v")
         cap = f.add_parameter(USIZE, "cap")
         # consider not silently fail the opposite?
@@ -64,9 +73,10 @@ class Vec:
 
     def gen_push(self):
         f = Function("vec_push", T=self.inner_type)
+        f.specify(storage="static", inline=True)
         v = f.add_parameter(("*", self.struct), "v")
         element = f.add_parameter(self.inner_type, "element")
-        with f.when((v, ".len"), "==", (v, ".cap")):
+        with f.when((v, ".len"), "==", (v, ".cap"), expect=False):
             cap = f.declare(USIZE, "cap")
             pos, neg = f.if_else((v, ".cap"), "==", Int(0, USIZE))
             with pos:
@@ -1,33 +1,66 @@
 from contextlib import contextmanager
 
+# number of pending chunks before a file backed writer flushes, checked on line breaks
+FLUSH_THRESHOLD = 4096
 
-def generate(item):
-    w = Writer()
-    item.write(w)
-    return w.buf
+
+def generate(item, *, jobs=None):
+    if jobs:
+        return render(lambda writer: item.write(writer, jobs=jobs))
+    return render(item.write)
+
+
+def generate_to(item, fp, *, jobs=None):
+    w = Writer(fp)
+    if jobs:
+        item.write(w, jobs=jobs)
+    else:
+        item.write(w)
+    w.flush()
 
 
 def mangled(item):
+    return render(item.write_mangled)
+
+
+def render(write):
     w = Writer()
-    item.write_mangled(w)
-    return w.buf
+    write(w)
+    return w.getvalue()
 
 
 class Writer:
-    def __init__(self):
-        self.buf = ""
+    def __init__(self, fp=None):
+        # content is collected as chunks and joined once, instead of growing a string per token
+        # with `fp` the chunks are flushed to it periodically so the full output is never held
+        self.chunks = []
+        self.fp = fp
         self.indent_level = 0
         self.fresh_line = True
+        # (result variable or None, exit label, whether a `return` jumped to it) while writing a
+        # profiled function, where `return` jumps to the exit label instead, see `cgen.profile`
+        self.return_exit = None
 
     def write(self, content):
         if self.fresh_line and content:
-            self.buf += " " * self.indent_level
+            self.chunks.append(" " * self.indent_level)
             self.fresh_line = False
-        self.buf += content
+        self.chunks.append(content)
 
     def line_break(self):
-        self.buf += "\n"
+        self.chunks.append("\n")
         self.fresh_line = True
+        if self.fp is not None and len(self.chunks) >= FLUSH_THRESHOLD:
+            self.flush()
+
+    def flush(self):
+        if self.fp is not None:
+            self.fp.write("".join(self.chunks))
+            self.chunks.clear()
+
+    def getvalue(self):
+        assert self.fp is None, "content is already flushed to file"
+        return "".join(self.chunks)
 
     def space(self):
         self.write(" ")
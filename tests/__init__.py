@@ -1,3 +1,18 @@
 # SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
 #
 # SPDX-License-Identifier: MIT
+import pytest
+
+from cgen.harness import CompileError, find_compiler
+
+
+def has_compiler():
+    try:
+        find_compiler()
+    except CompileError:
+        return False
+    return True
+
+
+# for tests that compile, with the compiler `cgen.harness` would use
+requires_cc = pytest.mark.skipif(not has_compiler(), reason="no C compiler")
@@ -0,0 +1,50 @@
+import pytest
+
+from cgen import I32, INT, USIZE, Function, GetItem, Int, Op, SetAttr, SetItem, Variable
+from cgen.gallery import fib
+from cgen.vec import Vec
+from cgen.writer import generate
+
+
+def test_fluent_matches_tokens():
+    vec = Vec(I32)
+    tokens = Function("f")
+    v = tokens.declare(vec.struct, "v")
+    m = tokens.declare(I32, "m")
+    tokens.add(vec.push, [("&", v), m])
+    tokens.add(m, "=", ((m, "+", Int(1)), "*", (Int(2), "-", m)))
+    tokens.add(v, ".len", "=", ((v, ".len"), "+", Int(1, USIZE)))
+    tokens.add((v, ".buf"), "[]", Int(0, USIZE), "=", ((v, ".buf"), "[]", (m, "as", USIZE)))
+
+    fluent = Function("f")
+    v = fluent.declare(vec.struct, "v")
+    m = fluent.declare(I32, "m")
+    fluent.run(vec.push(v.addr(), m))
+    fluent.assign(m, (m + 1) * (2 - m))
+    fluent.assign(v.attr("len"), v.attr("len") + 1)
+    fluent.assign(v.attr("buf")[0], v.attr("buf")[m.cast(USIZE)])
+    assert generate(fluent.body) == generate(tokens.body)
+    assert isinstance(fluent.body.statements[4], SetAttr)
+    assert isinstance(fluent.body.statements[5], SetItem)
+
+
+def test_operators():
+    x = Variable(I32, "x")
+    assert generate(x < 1) == "(x) < (1)"
+    assert generate(1 < x) == "(x) > (1)"  # noqa: SIM300 reflected
+    assert generate(1 << x) == "(1) << (x)"
+    assert generate(256 >> x) == "(256) >> (x)"
+    assert generate(x.eq(0).or_(~x)) == "((x) == (0)) || (~(x))"
+    assert (x < 1).ty is INT
+    assert x != x + 0  # identity, not an expression
+    assert isinstance(Variable(("*", I32), "p")[3], GetItem)
+    with pytest.raises(TypeError):
+        list(x)
+
+
+def test_call_literal_arguments():
+    f = fib()
+    call = f(10)
+    assert generate(call) == "fib(10)"
+    assert call.arguments[0].ty is I32
+    assert isinstance(f(10) + 1, Op)
@@ -0,0 +1,72 @@
+import os
+
+import cgen.cache
+from cgen import I32, U8, USIZE, Function, Include, Int, SourceCode
+from cgen.cache import load
+from cgen.gallery import fib
+from tests import requires_cc
+
+pytestmark = requires_cc
+
+
+def source_of(*functions):
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    source.add(Include("stddef.h"))
+    for function in functions:
+        source.add(function)
+    return source
+
+
+def byte_sum():
+    f = Function("byte_sum")
+    f.return_type = USIZE
+    s = f.add_parameter(("*", U8), "s")
+    n = f.add_parameter(USIZE, "n")
+    total = f.declare(USIZE, "total")
+    f.add(total, "=", Int(0, USIZE))
+    with f.loop(n, ">", Int(0, USIZE)):
+        f.add(n, "=", (n, "-", Int(1, USIZE)))
+        f.add(total, "=", (total, "+", ((s, "[]", n), "as", USIZE)))
+    f.ret(total)
+    return f
+
+
+def test_load(tmp_path, monkeypatch):
+    source = source_of(fib(), byte_sum())
+    library = load(source, directory=tmp_path)
+    assert library.fib(10) == 55
+    data = (cgen.cache.ctypes.c_uint8 * 3)(1, 2, 250)
+    assert library.byte_sum(data, 3) == 253
+
+    def no_compile(*_args, **_kwargs):
+        raise AssertionError("compiled again")
+
+    monkeypatch.setattr(cgen.cache, "compile_in", no_compile)
+    assert load(source_of(fib(), byte_sum()), directory=tmp_path).path == library.path
+
+
+def test_eviction(tmp_path):
+    first = load(source_of(fib()), directory=tmp_path).path
+    os.utime(first, (0, 0))
+    f = Function("answer")
+    f.return_type = I32
+    f.ret(Int(42))
+    second = load(source_of(f), directory=tmp_path, max_bytes=os.path.getsize(first))
+    assert second.answer() == 42
+    assert not os.path.exists(first)
+    assert os.listdir(tmp_path) == [os.path.basename(second.path)]
+
+
+def test_key_depends_on_flags(tmp_path):
+    source = source_of(fib())
+    assert load(source, directory=tmp_path).path != load(source, directory=tmp_path, flags=["-O0"]).path
+
+
+def test_load_skips_inline(tmp_path):
+    f = fib()
+    f.specify(inline=True)
+    g = byte_sum()
+    library = load(source_of(f, g), directory=tmp_path)
+    assert "fib" not in library.functions
+    assert "byte_sum" in library.functions
@@ -0,0 +1,63 @@
+import pytest
+
+from cgen import I32, U8, USIZE, Function, Int, SourceCode, Struct, checking
+from cgen.checking import DEFERRED, OFF, STRICT, TypeCheckError, checks, verify
+from cgen.writer import generate
+
+
+def ill_typed():
+    s = Struct("S")
+    s.add_field(I32, "x")
+    f = Function("f")
+    f.return_type = I32
+    v = f.declare(s, "v")
+    n = f.declare(USIZE, "n")
+    f.add(n, "=", Int(1, U8))
+    f.add(v, ".y", "=", Int(0))
+    f.ret(n)
+    return f
+
+
+def test_strict():
+    with pytest.raises(TypeCheckError, match="assign size_t with uint8_t"):
+        ill_typed()
+
+
+def test_deferred():
+    with checks(DEFERRED):
+        f = ill_typed()
+        source = SourceCode()
+        source.add(f)
+        with pytest.raises(TypeCheckError) as error:
+            generate(source)
+    assert str(error.value).splitlines() == [
+        "3 type errors",
+        "f: assign size_t with uint8_t",
+        "f: no field y",
+        "f: return size_t from f",
+    ]
+
+
+def test_deferred_after_off():
+    with checks(OFF):
+        f = ill_typed()
+        source = SourceCode()
+        source.add(f)
+        generate(source)
+    with checks(DEFERRED), pytest.raises(TypeCheckError, match="3 type errors"):
+        generate(source)
+
+
+def test_off():
+    with checks(OFF):
+        f = ill_typed()
+        verify([])
+    assert "v.y = 0;" in f.definition()
+    with pytest.raises(TypeCheckError):
+        verify([f])
+
+
+def test_checks_restores_level():
+    with pytest.raises(ValueError, match="inside"), checks(OFF):
+        raise ValueError("inside")
+    assert checking.level == STRICT
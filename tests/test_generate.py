@@ -1,6 +1,10 @@
-from cgen import I32, Function, SourceCode
+import io
+
+import pytest
+
+from cgen import I32, U32, USIZE, Function, Int, SourceCode
 from cgen.gallery import fib
-from cgen.writer import generate
+from cgen.writer import generate, generate_to
 
 fib_source = """\
 int32_t fib(int32_t);
@@ -29,6 +33,14 @@ def test_fib():
     assert g == fib_source
 
 
+def test_generate_to():
+    s = SourceCode()
+    s.add(fib())
+    fp = io.StringIO()
+    generate_to(s, fp)
+    assert fp.getvalue() == fib_source
+
+
 def test_declare():
     f = Function("test")
     x = f.declare(I32)
@@ -43,3 +55,29 @@ def test_declare():
     assert a.name == "a2"
     a = f.declare(I32, "a")
     assert a.name == "a3"
+
+
+def test_small_int_shared():
+    assert Int(1) is Int(1)
+    assert Int(1) is not Int(1, USIZE)
+    assert Int(1 << 20) is not Int(1 << 20)
+    assert not hasattr(Int(1 << 20), "__dict__")
+    with pytest.raises(AssertionError, match="Int of True"):
+        Int(True)
+    with pytest.raises(AssertionError, match="Int of 'x'"):
+        Int("x")
+    assert generate(Int(1)) == "1"
+
+
+def test_regenerate_after_edit():
+    s = SourceCode()
+    f = fib()
+    s.add(f)
+    assert generate(s) == fib_source
+    f.return_type = U32
+    f.body.statements.pop()
+    f.invalidate()
+    assert generate(s).splitlines()[0] == "uint32_t fib(int32_t);"
+    assert "return a;" not in generate(s)
+    f.add(f.parameters[0], "=", Int(0))
+    assert "  n = 0;\n}" in generate(s)
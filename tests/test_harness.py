@@ -0,0 +1,24 @@
+import pytest
+
+from cgen import Function, SourceCode
+from cgen.gallery import vec_main
+from cgen.harness import CompileError, benchmark, compiled, summary
+from tests import requires_cc
+
+
+@requires_cc
+def test_benchmark():
+    result = benchmark(vec_main(unroll=10), [5], repeat=2)
+    assert len(result["seconds"]) == 2
+    assert result["min"] <= result["median"]
+    assert result["compile_seconds"] > 0
+    assert result["binary_bytes"] > 0
+    assert summary({"vec": result}).startswith("vec\n  compile ")
+
+
+@requires_cc
+def test_compile_error():
+    s = SourceCode()
+    s.add(Function("main"))
+    with pytest.raises(CompileError), compiled(s, flags=["--no-such-flag"]):
+        pass
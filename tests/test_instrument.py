@@ -0,0 +1,63 @@
+import pytest
+
+from cgen import Op, SourceCode, checking
+from cgen.gallery import fib, vec_main
+from cgen.instrument import instrument
+from cgen.vec import Vec
+from cgen.writer import generate
+
+
+# `Vec` instantiations are shared between tests with their rendered text cached, start afresh so
+# every function is rendered under the instrumentation
+@pytest.fixture(autouse=True)
+def fresh_vec():
+    Vec.interned.clear()
+
+
+def test_instrument():
+    with instrument() as report:
+        source = vec_main(unroll=10)
+        generate(source)
+    result = report.as_dict(top=2)
+    assert set(result["phases"]) == {"parse", "construct", "check", "emit"}
+    assert result["nodes"]["IfElse"] >= 10
+    assert result["nodes"]["Run"] >= 10
+    assert result["emitted_bytes"]["struct Vec__int32_t"] > 0
+    assert result["emitted_bytes"]["main"] > result["emitted_bytes"]["vec_new__int32_t"]
+    assert len(result["slowest_functions"]) == 2
+    assert "slowest 2 functions" in report.summary(top=2)
+
+
+def test_declarations_counted():
+    with instrument() as report:
+        f = fib()
+        f.forward_declaration()
+    assert report.emitted["fib"] == len(f.forward_declaration())
+
+
+def test_deferred_checks_timed():
+    with checking.checks(checking.DEFERRED), instrument() as report:
+        s = SourceCode()
+        s.add(fib())
+        generate(s)
+    assert report.phases["check"] > 0
+    checking.verify([fib()])
+    assert checking.visits[Op][0] is Op.check  # not the instrumented one
+
+
+def test_parallel_render_timed():
+    with instrument() as report:
+        source = vec_main(unroll=10)
+        generate(source, jobs=2)
+    assert set(report.render_seconds) >= {"main", "vec_new__int32_t"}
+    assert report.emitted["main"] > 0
+
+
+def test_disabled_after():
+    with instrument() as report:
+        pass
+    s = SourceCode()
+    s.add(fib())
+    generate(s)
+    assert not report.nodes
+    assert not report.emitted
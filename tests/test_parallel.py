@@ -0,0 +1,42 @@
+import multiprocessing
+import pickle
+
+from cgen import I32, Int, Pointer, SourceCode
+from cgen.gallery import fib
+from cgen.parallel import render_definitions
+from cgen.vec import Vec
+from cgen.writer import generate
+
+
+def build():
+    source = SourceCode()
+    source.add(Vec(I32))
+    for _ in range(20):
+        f = fib()
+        f.name = f"fib{len(source.functions)}"
+        source.add(f)
+    return source
+
+
+def test_pickle_interned():
+    assert pickle.loads(pickle.dumps(Pointer(I32))) is Pointer(I32)
+    assert pickle.loads(pickle.dumps(Int(3))) is Int(3)
+    f = fib()
+    assert pickle.loads(pickle.dumps(f)).definition() == f.definition()
+
+
+def test_parallel_identical():
+    serial = generate(build())
+    assert generate(build(), jobs=3) == serial
+
+
+def test_spawn_identical(monkeypatch):
+    source = build()
+    for f in source.functions:
+        f.invalidate()
+    serial = [f.definition() for f in source.functions]
+    for f in source.functions:
+        f.invalidate()
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    render_definitions(source.functions, 2)
+    assert [f.definition_text for f in source.functions] == serial
@@ -0,0 +1,152 @@
+from cgen import I32, INT, U8, U32, U64, USIZE, Function, Int, Op, Pointer, SourceCode, Variable
+from cgen.passes import DEFAULT_PASSES, BlockPass, RemoveSelfAssignment, fold_constants, run_passes
+from cgen.vec import Vec
+from cgen.writer import generate
+
+
+def folded(*tokens, ty=I32):
+    f = Function("f")
+    x = f.declare(ty, "x")
+    f.add(x, "=", tokens)
+    fold_constants(f)
+    return generate(f.body.statements[1])
+
+
+def test_fold_arithmetic():
+    assert folded((Int(2), "+", Int(3)), "*", Int(4)) == "x = 20;"
+    assert folded(Int(-7), "/", Int(2)) == "x = -3;"
+    assert folded(Int(-7), "%", Int(2)) == "x = -1;"
+    assert folded(Int(1), "/", Int(0)) == "x = (1) / (0);"
+    assert folded(Int(3, U32), "-", Int(5, U32), ty=U32) == "x = 4294967294;"
+
+
+def test_fold_respects_width():
+    # signed overflow is undefined, uint8_t arithmetic happens in int
+    assert folded(Int(2**31 - 1), "+", Int(1)) == "x = (2147483647) + (1);"
+    assert folded(Int(200, U8), "+", Int(100, U8), ty=U8) == "x = (200) + (100);"
+    assert folded(Int(200, U8), "-", Int(100, U8), ty=U8) == "x = 100;"
+    assert folded(Int(1), "<<", Int(31)) == "x = (1) << (31);"
+    assert folded(Int(1, U32), "<<", Int(31), ty=U32) == "x = 2147483648;"
+
+
+def test_fold_comparison():
+    f = Function("f")
+    x = f.declare(INT, "x")
+    f.add(x, "=", (Int(1), "<", Int(2)))
+    f.add(x, "=", (Int(-1), "<", Int(0, U32)))
+    fold_constants(f)
+    assert [generate(statement) for statement in f.body.statements[1:]] == ["x = 1;", "x = (-1) < (0);"]
+
+
+def test_fold_types():
+    # `&&` and `||` are `int` in C whatever their operands
+    m = Variable(U32, "m")
+    assert Op("&&", m, Int(1, U32)).ty is INT
+    assert Op("||", m, Int(1, U32)).ty is INT
+    assert folded(Int(0, U32), "&&", m, ty=INT) == "x = 0;"
+    assert folded(Int(1, U64), "<<", Int(63), ty=U64) == "x = 9223372036854775808ULL;"
+    assert folded(Int(1, U64), "<<", Int(62), ty=U64) == "x = 4611686018427387904;"
+
+
+def test_fold_shared():
+    m = Variable(I32, "m")
+    shared = (m + Int(2) * Int(3)) + Int(0)
+    inner = shared.left
+    f, g = Function("f"), Function("g")
+    f.assign(m, shared)
+    g.assign(m, shared)
+    fold_constants(f)
+    assert generate(f.body) == "{\n  m = (m) + (6);\n}"
+    assert shared.left is inner
+    assert generate(g.body) == "{\n  m = ((m) + ((2) * (3))) + (0);\n}"
+
+
+def test_identities():
+    m = Variable(I32, "m")
+    assert folded(m, "+", Int(0)) == "x = m;"
+    assert folded(Int(1), "*", (m, "-", Int(0))) == "x = m;"
+    assert folded(m, "*", Int(0)) == "x = 0;"
+    assert folded(m, "<<", Int(0)) == "x = m;"
+    assert folded((m, "+", Int(0)), "+", (Int(2), "*", Int(3))) == "x = (m) + (6);"
+
+
+def test_constant_branches():
+    f = Function("f")
+    n = f.add_parameter(USIZE, "n")
+    for i in range(3):
+        m = Int(i, USIZE)
+        with f.when(m, "<", Int(2, USIZE)):
+            f.add(n, "=", (n, "+", m))
+    with f.loop(Int(0), "!=", Int(0)):
+        f.add(n, "=", Int(0, USIZE))
+    fold_constants(f)
+    assert generate(f.body) == "{\n  n = n;\n  n = (n) + (1);\n}"
+
+
+def test_peephole():
+    f = Function("f")
+    f.return_type = I32
+    n = f.add_parameter(I32, "n")
+    with f.when(n, "<", Int(0)):
+        f.add(n, "=", n)
+    f.label("unused")
+    skip = f.goto()
+    f.add(n, "=", Int(1))
+    x = f.declare(I32, "x")
+    skip.label = f.label("skip")
+    f.add(x, "=", n)
+    f.ret(x)
+    f.add(n, "=", Int(2))
+    run_passes(f)
+    assert (
+        generate(f.body)
+        == "{\n  if ((n) < (0)) {\n    ;\n  }\n  goto skip;\n  int32_t x;\n  skip:\n  x = n;\n  return x;\n}"
+    )
+
+
+def test_volatile_self_assignment():
+    f = Function("f")
+    p = f.add_parameter(Pointer(I32, ("volatile",)), "p")
+    q = f.add_parameter(Pointer(I32), "q")
+    f.assign(p, p)
+    f.assign(q, q)
+    BlockPass()(f)
+    assert len(f.body.statements) == 2
+    RemoveSelfAssignment()(f)
+    assert generate(f.body) == "{\n  p = p;\n}"
+
+
+def test_source_passes():
+    s = SourceCode()
+    f = Function("f")
+    m = f.add_parameter(I32, "m")
+    for i in range(2):
+        with f.when(Int(i), "<", m):
+            f.add(m, "=", (m, "+", Int(0)))
+    s.add(f)
+    s.passes = DEFAULT_PASSES
+    assert generate(s).endswith(
+        "void f(int32_t m) {\n  if ((0) < (m)) {\n    ;\n  }\n  if ((1) < (m)) {\n    ;\n  }\n}"
+    )
+
+
+def test_passes_per_source():
+    def vec_source(passes):
+        source = SourceCode()
+        source.add(Vec(I32))
+        source.passes = passes
+        return source
+
+    plain = generate(vec_source([]))
+    passed = generate(vec_source(DEFAULT_PASSES))
+    assert "} else {\n    ;\n  }" in plain
+    assert "} else {\n    ;\n  }" not in passed
+    # the shared functions of `Vec(I32)` are not changed by the passes of another source
+    assert generate(vec_source([])) == plain
+    assert generate(vec_source(DEFAULT_PASSES)) == passed
+    # and passes set after the source was generated apply
+    late = vec_source([])
+    assert generate(late) == plain
+    late.passes = DEFAULT_PASSES
+    assert generate(late) == passed
+    assert generate(late, jobs=2) == passed
@@ -0,0 +1,94 @@
+import platform
+import subprocess
+
+import pytest
+
+from cgen import I32, INT, Function, Include, Int, SourceCode
+from cgen.gallery import fib, vec_main
+from cgen.harness import compiled
+from cgen.profile import parse_profile
+from cgen.split import write_split
+from cgen.vec import Vec
+from cgen.writer import generate
+from tests import requires_cc
+
+
+def run(source, *arguments):
+    with compiled(source, flags=("-O2", "-Wall", "-Werror")) as build:
+        return subprocess.run([build.path, *map(str, arguments)], capture_output=True, text=True, check=True)
+
+
+def test_profiled_text():
+    source = SourceCode()
+    source.add(fib())
+    plain = generate(source)
+    source.profile = "clock"
+    text = generate(source)
+    assert '{"fib", 0, 0},' in text
+    assert "cgen_profile_result = a; goto cgen_profile_exit;" in text
+    assert "return cgen_profile_result;" in text
+    # the cached definitions are not changed
+    source.profile = None
+    assert generate(source) == plain
+
+
+def test_exit_label_only_with_return():
+    source = SourceCode()
+    source.add(fib())
+    source.add(Vec(I32))
+    source.profile = "clock"
+    assert generate(source).count("cgen_profile_exit:") == 2  # fib and vec_new, not the void functions
+
+
+def test_profiled_parallel():
+    source = vec_main()
+    source.profile = "clock"
+    assert generate(source, jobs=2) == generate(source)
+
+
+MODES = [("clock", "ns")]
+if platform.machine() in ("x86_64", "AMD64", "i686"):
+    MODES.append(("rdtsc", "cycles"))
+
+
+@requires_cc
+@pytest.mark.parametrize(("mode", "expected_unit"), MODES)
+def test_profile_counts(mode, expected_unit):
+    source = vec_main()
+    source.profile = mode
+    result = run(source, 100)
+    unit, entries = parse_profile(result.stderr, source)
+    assert unit == expected_unit
+    calls = {entry.name: entry.calls for entry in entries}
+    assert calls == {"main": 1, "vec_new": 1, "vec_push": 100, "vec_reserve": 5, "vec_drop": 1}
+    (push,) = [entry for entry in entries if entry.name == "vec_push"]
+    assert push.type_arguments == {"T": I32}
+    assert entries[0].name == "main"  # inclusive time
+
+
+@requires_cc
+def test_profile_early_returns():
+    f = fib()
+    main = Function("main")
+    main.return_type = INT
+    n = main.declare(I32, "n")
+    main.add(n, "=", (f, [Int(10)]))
+    with main.when(n, "==", Int(55)):
+        main.ret(Int(0, INT))
+    main.ret(Int(1, INT))
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    source.add(f)
+    source.add(main)
+    source.profile = "clock"
+    result = run(source)
+    assert result.returncode == 0
+    _, entries = parse_profile(result.stderr, source)
+    assert {entry.name: entry.calls for entry in entries} == {"main": 1, "fib": 1}
+
+
+def test_split_rejects_profile(tmp_path):
+    source = vec_main()
+    source.profile = "clock"
+    with pytest.raises(ValueError, match="profile"):
+        write_split(source, tmp_path)
@@ -0,0 +1,62 @@
+import pytest
+
+from cgen import I32, INT, USIZE, Function, Int, SourceCode, Struct
+from cgen.gallery import vec_main
+from cgen.prune import prune
+from cgen.vec import Vec
+from cgen.writer import generate
+
+
+def test_prune_unused_vec_functions():
+    vec = Vec(I32)
+    f = Function("main")
+    f.return_type = INT
+    v = f.declare(vec.struct, "v")
+    f.add(v, "=", (vec.new, []))
+    f.add(vec.drop, [v])
+    f.ret(Int(0, INT))
+    source = SourceCode()
+    source.add(vec)
+    source.add(f)
+    report = prune(source)
+    assert report.functions == ["vec_reserve__int32_t", "vec_push__int32_t"]
+    assert report.structs == []
+    assert [generate(function) for function in source.functions] == ["vec_new__int32_t", "vec_drop__int32_t", "main"]
+    # pruned items can be added again
+    source.add(vec)
+    assert len(source.functions) == 5
+
+
+def test_prune_keeps_reached_items():
+    source = vec_main()
+    text = generate(source)
+    report = prune(source)
+    assert report.functions == report.structs == []
+    assert generate(source) == text
+
+
+def test_prune_structs_through_fields():
+    inner, outer, unused = Struct("Inner"), Struct("Outer"), Struct("Unused")
+    inner.add_field(I32, "x")
+    outer.add_field(inner, "inner")
+    unused.add_field(USIZE, "n")
+    f = Function("size")
+    f.return_type = USIZE
+    f.ret("sizeof", outer)
+    source = SourceCode()
+    for item in (inner, outer, unused, f):
+        source.add(item)
+    report = prune(source, roots=[f])
+    assert report.structs == ["struct Unused"]
+    assert source.structs == [inner, outer]
+
+
+def test_prune_rejects_lazy_and_unknown_roots():
+    f = Function("main")
+    f.stream(list)
+    source = SourceCode()
+    source.add(f)
+    with pytest.raises(ValueError, match="materialize"):
+        prune(source)
+    with pytest.raises(AssertionError, match="no function start"):
+        prune(source, roots=["start"])
@@ -0,0 +1,76 @@
+import ctypes
+import random
+import re
+
+import pytest
+
+from cgen import Include, SourceCode
+from cgen.harness import compiled
+from cgen.regex import Dfa, matcher, parse_regex
+from tests import requires_cc
+
+PATTERNS = [
+    r"ab|cd",
+    r"(ab|cd)*x",
+    r"[a-c]+d?",
+    r"a{2,3}b",
+    r"\d+\.\d*",
+    r"[^ab]c",
+    r"x.y",
+    r"(?:a|b)*abb",
+    r"\w+@\w+\.(com|org)",
+    r"[]a-]",
+    r"(a|)b",
+]
+ALPHABET = b"abcdxyz.@0123 \n-]"
+
+
+def samples(count):
+    rng = random.Random(0)
+    return [bytes(rng.choice(ALPHABET) for _ in range(rng.randint(0, 10))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_dfa_agrees_with_re(pattern):
+    match, search = Dfa.from_pattern(pattern), Dfa.from_pattern(pattern, search=True)
+    for data in samples(500):
+        assert match.matches(data) == (re.match(pattern.encode(), data) is not None)
+        assert search.matches(data) == (re.search(pattern.encode(), data) is not None)
+
+
+def test_minimized():
+    # a*b*c accepted on reaching c, and the two loops need a state each
+    assert len(Dfa.from_pattern("a*b*c").transitions) == 3
+    assert len(Dfa.from_pattern("(a|a)(b|b)").transitions) == 3
+
+
+@pytest.mark.parametrize(
+    ("pattern", "message"),
+    [
+        (r"^a", "anchors"),
+        (r"a*?", "lazy"),
+        (r"(?=a)", "group extensions"),
+        (r"\b", "unsupported escape"),
+        (r"(a", "end of pattern"),
+        (r"*", "nothing to repeat"),
+    ],
+)
+def test_unsupported(pattern, message):
+    with pytest.raises(ValueError, match=message):
+        parse_regex(pattern)
+
+
+@requires_cc
+def test_generated_agrees_with_re():
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    source.add(Include("stddef.h"))
+    for i, pattern in enumerate(PATTERNS):
+        source.add(matcher(pattern, f"match{i}"))
+        source.add(matcher(pattern, f"search{i}", search=True))
+    with compiled(source, flags=["-O1", "-shared", "-fPIC"]) as build:
+        library = ctypes.CDLL(build.path)
+        for i, pattern in enumerate(PATTERNS):
+            for data in samples(100):
+                assert library[f"match{i}"](data, len(data)) == (re.match(pattern.encode(), data) is not None)
+                assert library[f"search{i}"](data, len(data)) == (re.search(pattern.encode(), data) is not None)
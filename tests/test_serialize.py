@@ -0,0 +1,104 @@
+import io
+
+import pytest
+
+from cgen import I32, USIZE, Function, Int, Pointer, SourceCode, Struct
+from cgen.gallery import fib, vec_main
+from cgen.passes import run_passes
+from cgen.regex import matcher
+from cgen.serialize import dump, dumps, load, loads
+from cgen.writer import generate
+
+
+def linked_list():
+    node = Struct("Node")
+    node.add_field(I32, "value")
+    node.add_field(Pointer(node), "next")
+    f = Function("length")
+    f.return_type = USIZE
+    head = f.add_parameter(("*", node), "head")
+    with f.when(head, "==", Int(0, USIZE)):
+        f.ret(Int(0, USIZE))
+    f.ret((f, [(head, ".next")]), "+", Int(1, USIZE))
+    source = SourceCode()
+    source.add(node)
+    source.add(f)
+    return source
+
+
+def unrolled():
+    f = Function("sum")
+    f.return_type = I32
+    a = f.add_parameter(("*", I32), "a")
+    n = f.add_parameter(USIZE, "n")
+    i = f.declare(USIZE, "i")
+    total = f.declare(I32, "total")
+    f.add(i, "=", Int(0, USIZE))
+    f.add(total, "=", Int(0))
+    f.unroll(i, n, 4, lambda index: f.add(total, "=", (total, "+", (a, "[]", index))), remainder="switch")
+    f.ret(total)
+    source = SourceCode()
+    source.add(f)
+    return source
+
+
+def qualified():
+    f = Function("copy")
+    f.specify(storage="static", inline=True, attributes=("hot",))
+    out = f.add_parameter(("*", "restrict", I32), "out")
+    a = f.add_parameter(("*", "restrict", ("const", I32)), "a")
+    with f.when((a, "[]", Int(0, USIZE)), "!=", Int(0), expect=True):
+        f.add(out, "[]", Int(0, USIZE), "=", (a, "[]", Int(0, USIZE)))
+    return f
+
+
+def with_passes():
+    source = vec_main(unroll=3)
+    run_passes(source)
+    return source
+
+
+@pytest.mark.parametrize(
+    "build", [vec_main, linked_list, unrolled, qualified, with_passes, lambda: matcher("a(b|c)*d")]
+)
+def test_round_trip(build):
+    source = build()
+    if isinstance(source, Function):
+        function, source = source, SourceCode()
+        source.add(function)
+    data = dumps(source)
+    loaded = loads(data)
+    assert loaded is not source
+    assert generate(loaded) == generate(source)
+    assert dumps(loaded) == data
+
+
+def test_loaded_graph_is_shared():
+    loaded = loads(dumps(linked_list()))
+    node, length = loaded.structs[0], loaded.functions[0]
+    assert node.field_index["next"][1] is Pointer(node)
+    assert length.parameters[0].ty is Pointer(node)
+    assert length.body.statements[-1].inner.left.callee is length
+    assert length.ty.return_type is USIZE
+
+
+def test_file_and_version():
+    fp = io.BytesIO()
+    dump(fib_source(), fp)
+    fp.seek(0)
+    loaded = load(fp)
+    assert generate(loaded) == generate(fib_source())
+    # identifier counters are kept, so the loaded function can be extended
+    assert loaded.functions[0].declare(I32, "a").name == "a2"
+    data = bytearray(dumps(fib_source()))
+    data[4] += 1
+    with pytest.raises(ValueError, match="version"):
+        loads(bytes(data))
+    with pytest.raises(ValueError, match="not a serialized"):
+        loads(b"nope")
+
+
+def fib_source():
+    source = SourceCode()
+    source.add(fib())
+    return source
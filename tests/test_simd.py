@@ -0,0 +1,112 @@
+import ctypes
+
+import pytest
+
+from cgen import I32, U32, USIZE, Function, Include, Op, Primitive, SourceCode, TypeCheckError, Variable, VectorType
+from cgen.cache import load
+from cgen.prune import prune
+from cgen.serialize import dumps, loads
+from cgen.simd import Simd
+from cgen.writer import generate
+from tests import requires_cc
+
+FLOAT = Primitive("float")
+DOUBLE = Primitive("double")
+I64 = Primitive("int64_t")
+
+
+def test_vector_type():
+    assert VectorType(I32, 4) is VectorType(I32, 4)
+    assert VectorType(I32, 4) is not VectorType(I32, 8)
+    assert generate(VectorType(I32, 4)) == "vector4_int32_t"
+    assert VectorType(U32, 8).definition() == (
+        "typedef uint32_t vector8_uint32_t __attribute__((vector_size(8 * sizeof(uint32_t))));"
+    )
+    assert VectorType(FLOAT, 4).mask_type() is VectorType(I32, 4)
+    with pytest.raises(AssertionError, match="power of 2"):
+        VectorType(I32, 3)
+
+
+def test_lanewise_ops():
+    v = Variable(VectorType(I32, 4), "v")
+    u = Variable(VectorType(I32, 4), "u")
+    w = Variable(VectorType(FLOAT, 4), "w")
+    assert (v + v).ty is v.ty
+    assert (v * 2).ty is v.ty  # broadcast
+    assert (Variable(I32, "x") - v).ty is v.ty
+    assert (v < u).ty is VectorType(I32, 4)
+    assert w.eq(w).ty is VectorType(I32, 4)
+    assert (v & v).ty is v.ty
+    with pytest.raises(TypeCheckError, match="vector4_int32_t \\+ vector8_int32_t"):
+        v + Variable(VectorType(I32, 8), "u")
+    with pytest.raises(TypeCheckError, match="vector4_int32_t \\+ uint32_t"):
+        v + Variable(U32, "y")
+    with pytest.raises(TypeCheckError, match="%"):
+        w % w
+    with pytest.raises(TypeCheckError, match="!"):
+        Op.unary("!", v)
+
+
+def test_broadcast_literals():
+    for lane_type in (I64, DOUBLE, FLOAT, Primitive("int8_t"), Primitive("uint16_t")):
+        v = Variable(VectorType(lane_type, 2), "v")
+        assert generate(v + 1) == "(v) + (1)"
+        assert (2 * v).ty is v.ty
+        assert (v * 2).right.ty is lane_type
+    assert (Variable(VectorType(DOUBLE, 2), "v") < 0).ty is VectorType(I64, 2)
+
+
+def test_lanes():
+    v = Variable(VectorType(I32, 4), "v")
+    assert v[3].ty is I32
+    f = Function("f")
+    f.assign(v[0], Variable(I32, "x"))
+    with pytest.raises(TypeCheckError, match="lane 4"):
+        v[4]
+    with pytest.raises(TypeCheckError, match="store"):
+        f.assign(v[0], Variable(U32, "y"))
+
+
+def add_into(simd):
+    f = Function("add_into")
+    out = f.add_parameter(("*", "restrict", I32), "out")
+    a = f.add_parameter(("*", "restrict", I32), "a")
+    x = f.add_parameter(I32, "x")
+    n = f.add_parameter(USIZE, "n")
+    i = f.declare(USIZE, "i")
+    f.assign(i, 0)
+    with f.loop(i, "<", n):
+        total = simd.load(out[i].addr()) + simd.load(a[i].addr()) + simd.broadcast(x)
+        f.run(simd.store(out[i].addr(), total))
+        f.assign(i, i + simd.ty.lanes)
+    return f
+
+
+def simd_source():
+    simd = Simd(I32, 4)
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    source.add(Include("stddef.h"))
+    source.add(simd)
+    source.add(add_into(simd))
+    return source
+
+
+def test_source_items():
+    source = simd_source()
+    assert source.structs == [VectorType(I32, 4)]
+    assert loads(dumps(source)).structs == [VectorType(I32, 4)]
+    assert generate(loads(dumps(source))) == generate(source)
+    report = prune(source, roots=["add_into"])
+    assert report.structs == []
+    unused = SourceCode()
+    unused.add(Simd(I32, 8))
+    assert prune(unused, roots=[]).structs == ["vector8_int32_t"]
+
+
+@requires_cc
+def test_simd_runs(tmp_path):
+    library = load(simd_source(), flags=("-O2", "-Wall", "-Werror"), directory=tmp_path)
+    out, a = (ctypes.c_int32 * 8)(*range(8)), (ctypes.c_int32 * 8)(*range(0, 80, 10))
+    library.add_into(out, a, 100, 8)
+    assert list(out) == [i + 10 * i + 100 for i in range(8)]
@@ -0,0 +1,150 @@
+import ctypes
+import subprocess
+
+import pytest
+
+from cgen import (
+    I32,
+    USIZE,
+    Function,
+    Include,
+    Int,
+    Pointer,
+    Qualified,
+    SourceCode,
+    Struct,
+    TypeCheckError,
+    Variable,
+    assignable,
+    parse_type,
+)
+from cgen.cache import load
+from cgen.gallery import vec_main
+from cgen.harness import compiled
+from cgen.vec import Vec
+from cgen.writer import generate
+from tests import requires_cc
+
+
+def test_pointer_qualifiers():
+    restrict = Pointer(I32, ("restrict",))
+    assert restrict is Pointer(I32, ["restrict"])
+    assert restrict is parse_type(("*", "restrict", I32))
+    assert restrict is not Pointer(I32)
+    assert Pointer(I32, ("restrict", "const")).qualifiers == ("const", "restrict")
+    declare = Function("f")
+    declare.add_parameter(restrict, "a")
+    declare.add_parameter(Pointer(Pointer(I32, ("const",))), "b")
+    assert declare.forward_declaration() == "void f(int32_t *restrict, int32_t *const *);"
+    assert "void f(int32_t *restrict a, int32_t *const *b) {" in declare.definition()
+    with pytest.raises(AssertionError, match="unknown qualifiers"):
+        Pointer(I32, ("atomic",))
+
+
+def add_into():
+    f = Function("add_into")
+    out = f.add_parameter(("*", "restrict", I32), "out")
+    a = f.add_parameter(("*", "restrict", ("const", I32)), "a")
+    n = f.add_parameter(USIZE, "n")
+    i = f.declare(USIZE, "i")
+    f.add(i, "=", Int(0, USIZE))
+    with f.loop(i, "<", n):
+        f.add(out, "[]", i, "=", ((out, "[]", i), "+", (a, "[]", i)))
+        f.add(i, "=", (i, "+", Int(1, USIZE)))
+    return f
+
+
+def test_qualifiers_are_assignable():
+    f = add_into()
+    caller = Function("caller")
+    buffer = caller.add_parameter(("*", I32), "buffer")
+    caller.add(f, [buffer, buffer, Int(4, USIZE)])
+    restricted = caller.declare(f.parameters[0].ty, "restricted")
+    caller.add(restricted, "=", buffer)
+    with pytest.raises(TypeCheckError, match="argument 2"):
+        caller.add(f, [buffer, buffer, Int(4)])
+    with pytest.raises(TypeCheckError, match="assign"):
+        caller.add(restricted, "=", Variable(Pointer(USIZE), "other"))
+
+
+def test_pointee_qualifiers():
+    const = Qualified(I32, ("const",))
+    assert const is parse_type(("const", I32))
+    assert Pointer(const, ("restrict",)) is parse_type(("*", "restrict", ("const", I32)))
+    assert add_into().forward_declaration() == ("void add_into(int32_t *restrict, const int32_t *restrict, size_t);")
+    assert generate(Pointer(Qualified(I32, ("volatile", "const")))) == "const volatile int32_t *"
+    # qualifiers can be added to the pointee, not dropped
+    assert assignable(Pointer(const), Pointer(I32))
+    assert not assignable(Pointer(I32), Pointer(const))
+    with pytest.raises(AssertionError, match="qualify"):
+        Qualified(Pointer(I32), ("const",))
+    with pytest.raises(AssertionError, match="unknown qualifiers"):
+        Qualified(I32, ("restrict",))
+
+
+def test_const_stores():
+    node = Struct("node")
+    node.add_field(I32, "value")
+    f = Function("f")
+    a = f.add_parameter(Pointer(Qualified(I32, ("const",))), "a")
+    p = f.add_parameter(Pointer(I32, ("const",)), "p")
+    n = f.add_parameter(Pointer(Qualified(node, ("const",))), "n")
+    f.assign(p[0], a[1] + 1)  # through a const pointer, reading a const pointee
+    f.assign(a, p)
+    f.assign(Variable(I32, "x"), n.attr("value"))
+    with pytest.raises(TypeCheckError, match="store into const int32_t"):
+        f.assign(a[0], 1)
+    with pytest.raises(TypeCheckError, match="store into int32_t \\*const"):
+        f.assign(p, a)
+    with pytest.raises(TypeCheckError, match="store into const struct node"):
+        f.assign(n.attr("value"), 1)
+
+
+def test_function_specifiers():
+    f = Function("f")
+    f.specify(storage="static", inline=True, attributes=("hot", "always_inline"))
+    assert f.forward_declaration() == "__attribute__((hot, always_inline)) static inline void f();"
+    assert f.definition().startswith("__attribute__((hot, always_inline)) static inline void f() {")
+    f.specify()
+    assert f.forward_declaration() == "void f();"
+    with pytest.raises(AssertionError, match="unknown storage"):
+        f.specify(storage="register")
+    with pytest.raises(AssertionError, match="unknown attributes"):
+        f.specify(attributes=("fast",))
+
+
+def test_branch_hints():
+    f = Function("f")
+    f.return_type = I32
+    x = f.add_parameter(I32, "x")
+    with f.when(x, "==", Int(0), expect=False):
+        f.ret(Int(1))
+    pos, _ = f.if_else(x, ">", Int(0), expect=True)
+    with pos:
+        f.ret(x)
+    text = f.definition()
+    assert "if (__builtin_expect(!!((x) == (0)), 0)) {" in text
+    assert "if (__builtin_expect(!!((x) > (0)), 1)) {" in text
+
+
+def test_vec_push_fast_path():
+    vec = Vec(I32)
+    assert vec.push.forward_declaration().startswith("static inline void vec_push__int32_t(")
+    assert vec.reserve.forward_declaration().startswith("__attribute__((cold, noinline)) void vec_reserve__int32_t(")
+    assert "__builtin_expect" in vec.push.definition()
+
+
+@requires_cc
+def test_specified_source_runs(tmp_path):
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    source.add(Include("stddef.h"))
+    source.add(add_into())
+    source.add(Vec(I32))
+    library = load(source, flags=("-O2", "-Wall", "-Werror"), directory=tmp_path)
+    assert "vec_push__int32_t" not in library.functions  # static
+    out, a = (ctypes.c_int32 * 3)(1, 2, 3), (ctypes.c_int32 * 3)(10, 20, 30)
+    library.add_into(out, a, 3)
+    assert list(out) == [11, 22, 33]
+    with compiled(vec_main()) as build:
+        subprocess.run([build.path, "100"], check=True, stdout=subprocess.DEVNULL)
@@ -0,0 +1,76 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from cgen import I32, INT, Function, Int, SourceCode
+from cgen.gallery import vec_main
+from cgen.split import partition, write_split
+from cgen.writer import generate
+from tests import requires_cc
+
+
+def sized(name, statements):
+    f = Function(name)
+    x = f.declare(I32, "x")
+    for i in range(statements):
+        f.add(x, "=", Int(i))
+    return f
+
+
+def test_partition_is_balanced_and_ordered():
+    functions = [sized(f"f{i}", size) for i, size in enumerate([1, 9, 4, 4, 6, 2])]
+    units = partition(functions, 3)
+    assert [[f.name for f in unit] for unit in units] == [["f0", "f1"], ["f4", "f5"], ["f2", "f3"]]
+    assert partition(functions, 3) == units
+
+
+def test_write_split(tmp_path):
+    source = vec_main()
+    paths = write_split(source, tmp_path, units=2)
+    assert [os.path.basename(path) for path in paths] == ["main_0.c", "main_1.c"]
+    header = (tmp_path / "main.h").read_text()
+    assert header.startswith("#ifndef MAIN_H\n#define MAIN_H\n")
+    assert header.endswith("#endif\n")
+    units = [Path(path).read_text() for path in paths]
+    for unit in units:
+        assert unit.startswith('#include "main.h"\n')
+    # every definition is in exactly one file, unexported ones in the header
+    for function in source.functions:
+        files = [header, *units]
+        assert sum(function.definition() in text for text in files) == 1
+        assert (function.definition() in header) == (not function.exported)
+    assert (tmp_path / "files.txt").read_text() == "main_0.c\nmain_1.c\n"
+
+
+@requires_cc
+@pytest.mark.skipif(not shutil.which("make"), reason="no make")
+def test_split_builds(tmp_path):
+    source = vec_main()
+    write_split(source, tmp_path, units=3)
+    subprocess.run(["make", "-j3"], cwd=tmp_path, check=True, capture_output=True)
+    subprocess.run([str(tmp_path / "main"), "10"], check=True)
+    assert generate(source)  # still usable as a single file
+
+
+@requires_cc
+@pytest.mark.skipif(not shutil.which("make"), reason="no make")
+def test_split_inline_builds(tmp_path):
+    add1 = Function("add1")
+    add1.return_type = INT
+    x = add1.add_parameter(INT, "x")
+    add1.specify(inline=True)
+    add1.ret((x, "+", Int(1, INT)))
+    f = Function("main")
+    f.return_type = INT
+    f.ret((add1, [Int(-1, INT)]))
+    source = SourceCode()
+    source.add(add1)
+    source.add(f)
+    write_split(source, tmp_path, units=2)
+    assert add1.definition() in (tmp_path / "main.h").read_text()
+    # not inlined at -O0, so the call needs the external definition
+    subprocess.run(["make", "CFLAGS=-O0"], cwd=tmp_path, check=True, capture_output=True)
+    subprocess.run([str(tmp_path / "main")], check=True)
@@ -0,0 +1,59 @@
+import pytest
+
+from cgen import I32, USIZE, Function, Int, Op, SetItem, SourceCode
+from cgen.checking import DEFERRED, TypeCheckError, checks
+from cgen.passes import run_passes
+from cgen.writer import generate
+
+
+def fill(n, *, lazy):
+    f = Function("fill")
+    a = f.add_parameter(("*", I32), "a")
+    x = f.declare(I32, "x")
+
+    def statements():
+        for i in range(n):
+            yield SetItem(a, Int(i, USIZE), Op("+", x, Int(i)))
+
+    if lazy:
+        f.stream(statements)
+    else:
+        for statement in statements():
+            f.append(statement)
+    f.add(x, "=", Int(0))
+    return f
+
+
+def test_stream_matches_materialized():
+    eager, lazy = fill(5, lazy=False), fill(5, lazy=True)
+    assert lazy.lazy
+    assert lazy.definition() == eager.definition()
+    # written again from the factory
+    assert lazy.definition() == eager.definition()
+    source = SourceCode()
+    source.add(lazy)
+    assert generate(source, jobs=2).endswith(eager.definition())
+    lazy.materialize()
+    assert not lazy.lazy
+    assert lazy.definition() == eager.definition()
+
+
+def test_empty_stream():
+    f = Function("f")
+    f.stream(list)
+    assert f.definition() == "void f() {\n  ;\n}"
+
+
+def test_passes_reject_lazy():
+    with pytest.raises(ValueError, match="materialize"):
+        run_passes(fill(1, lazy=True))
+
+
+def test_deferred_check_of_stream():
+    f = Function("f")
+    x = f.declare(I32, "x")
+    f.stream(lambda: [Op("+", x, Int(0)), Op("+", x, Int(0, USIZE))])
+    source = SourceCode()
+    source.add(f)
+    with checks(DEFERRED), pytest.raises(TypeCheckError, match="int32_t \\+ size_t"):
+        generate(source)
@@ -0,0 +1,87 @@
+import gc
+
+import pytest
+
+from cgen import (
+    CHAR,
+    I32,
+    INT,
+    U8,
+    Array,
+    Function,
+    FunctionType,
+    GetAttr,
+    Int,
+    Op,
+    Pointer,
+    Primitive,
+    Struct,
+    Variable,
+)
+
+
+def test_interned():
+    assert Primitive("int32_t") is I32
+    assert Pointer(I32) is Pointer(I32)
+    assert Pointer(Pointer(CHAR)) is Pointer(Pointer(CHAR))
+    assert Pointer(I32) is not Pointer(U8)
+    assert FunctionType(INT, [Pointer(CHAR)]) is FunctionType(INT, (Pointer(CHAR),))
+
+
+def test_interned_not_kept_alive():
+    gc.collect()
+    before = len(Pointer.interned), len(FunctionType.interned)
+    for _ in range(100):
+        node = Struct("node")
+        Function("f").add_parameter(Pointer(node), "p")
+        FunctionType(I32, [Pointer(node)])
+    del node
+    gc.collect()
+    assert (len(Pointer.interned), len(FunctionType.interned)) == before
+
+
+def test_array_length():
+    assert Array(I32, 4) is Array(I32, 4)
+    assert Array(I32, 4) != Array(I32, 8)
+    assert len({Array(I32, 4), Array(I32, 8), Array(I32, 4)}) == 2
+
+
+def test_function_type():
+    f = Function("f")
+    f.return_type = I32
+    f.add_parameter(Pointer(U8))
+    assert f.ty is FunctionType(I32, [Pointer(U8)])
+    assert f.ty is f.ty
+    f.return_type = INT
+    assert f.ty is FunctionType(INT, [Pointer(U8)])
+    f.add_parameter(I32)
+    assert f.ty is FunctionType(INT, [Pointer(U8), I32])
+
+
+def test_stored_expression_types():
+    x = Variable(I32, "x")
+    assert Op.unary("!", x).ty is INT
+    assert Op.unary("~", x).ty is I32
+    assert Op.unary("&", x).ty is Pointer(I32)
+    assert Op.unary("&", Variable.type_unchecked("y")).ty is None
+    # types are stored at construction instead of walking the left spine on every access, which
+    # would also exceed the recursion limit here
+    chain = x
+    for i in range(10**4):
+        chain = Op("+", chain, Int(i % 7))
+    assert chain.ty is I32
+
+
+def test_struct_fields():
+    s = Struct("S")
+    for i in range(200):
+        s.add_field(I32, f"f{i}")
+    s.add_field(Pointer(U8), "p")
+    assert s.field_index["f150"] == (150, I32)
+    v = Variable(Pointer(s), "v")
+    assert GetAttr(v, "p").ty is Pointer(U8)
+    assert GetAttr(v, "p").arrow
+    with pytest.raises(AssertionError):
+        s.add_field(U8, "f3")
+    with pytest.raises(AssertionError):
+        GetAttr(v, "missing")
@@ -0,0 +1,62 @@
+import ctypes
+
+from cgen import U32, USIZE, Function, Include, Int, SourceCode
+from cgen.harness import compiled
+from cgen.writer import generate
+from tests import requires_cc
+
+
+def sum_function(name, factor, remainder):
+    f = Function(name)
+    f.return_type = U32
+    a = f.add_parameter(("*", U32), "a")
+    n = f.add_parameter(USIZE, "n")
+    i = f.declare(USIZE, "i")
+    total = f.declare(U32, "total")
+    f.add(i, "=", Int(0, USIZE))
+    f.add(total, "=", Int(0, U32))
+
+    # weighted by position, so the iteration order is checked too
+    def body(index):
+        f.add(total, "=", ((total, "*", Int(3, U32)), "+", (a, "[]", index)))
+
+    f.unroll(i, n, factor, body, remainder=remainder)
+    f.ret(total)
+    return f
+
+
+def test_unroll_switch():
+    text = generate(sum_function("f", 3, "switch").body)
+    assert "while (((n) - (i)) >= (3)) {" in text
+    assert "total = ((total) * (3)) + (a[(i) + (2)]);" in text
+    assert "switch ((n) - (i)) {\n    case 2: {" in text
+    assert "case 1: {" in text
+
+
+def test_unroll_int_bound():
+    f = Function("f")
+    i = f.declare(U32, "i")
+    f.unroll(i, 10, 4, lambda index: f.add(i, "=", index))
+    assert "while (((10) - (i)) >= (4)) {" in generate(f.body)
+
+
+@requires_cc
+def test_unroll_runs():
+    source = SourceCode()
+    source.add(Include("stdint.h"))
+    source.add(Include("stddef.h"))
+    cases = [(factor, remainder) for factor in (1, 3, 4) for remainder in ("loop", "switch")]
+    for factor, remainder in cases:
+        source.add(sum_function(f"sum_{factor}_{remainder}", factor, remainder))
+    with compiled(source, flags=["-O1", "-shared", "-fPIC"]) as build:
+        library = ctypes.CDLL(build.path)
+        for n in range(10):
+            values = (ctypes.c_uint32 * n)(*range(1, n + 1))
+            expected = 0
+            for value in range(1, n + 1):
+                expected = (expected * 3 + value) % 2**32
+            for factor, remainder in cases:
+                function = library[f"sum_{factor}_{remainder}"]
+                function.restype = ctypes.c_uint32
+                function.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.c_size_t]
+                assert function(values, n) == expected
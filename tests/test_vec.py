@@ -0,0 +1,41 @@
+import pytest
+
+from cgen import I32, U8, Function, Include, Int, Pointer, SourceCode
+from cgen.vec import Vec
+from cgen.writer import generate
+
+
+def test_instantiation_cached():
+    assert Vec(I32) is Vec(I32)
+    assert Vec(("*", U8)) is Vec(Pointer(U8))
+    assert Vec(I32) is not Vec(U8)
+
+
+def test_source_dedupe():
+    single = SourceCode()
+    single.add(Vec(I32))
+    source = SourceCode()
+    source.add(Include("stdio.h"))
+    source.add(Vec(I32))
+    source.add(Vec(I32))
+    source.add(Vec(I32).push)
+    assert len(source.structs) == 1
+    assert len(source.functions) == 4
+    assert generate(source).count("struct Vec__int32_t {") == 1
+    lines = [line for line in generate(source).splitlines() if line != "#include <stdio.h>"]
+    assert lines == generate(single).splitlines()
+    assert generate(source).startswith("#include <stdio.h>\n#include <stdlib.h>\n#include <assert.h>\n")
+
+
+def returning(value):
+    f = Function("helper")
+    f.return_type = I32
+    f.ret(Int(value))
+    return f
+
+
+def test_name_clash():
+    source = SourceCode()
+    source.add(returning(1))
+    with pytest.raises(ValueError, match="helper is defined by two different items"):
+        source.add(returning(2))